@@ -0,0 +1,113 @@
+import queue
+import threading
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
+
+from features import stft_window
+
+ANALYZER_FFT = 2048
+ANALYZER_HOP = 512
+DISPLAY_BANDS = 128
+HISTORY_ROWS = 256  # spectrogram frames kept for display
+MIN_FREQ = 20.0
+DISPLAY_FLOOR_DB = -96.0
+FALL_DB = 3.0  # spectrum line falloff per hop, so peaks stay readable
+QUEUE_BLOCKS = 64
+
+@lru_cache(maxsize=8)
+def display_bands(sample_rate: int, n_fft: int = ANALYZER_FFT, bands: int = DISPLAY_BANDS) -> np.ndarray:
+    """
+    First rfft bin of each log-spaced display band from MIN_FREQ to Nyquist.
+    Low bands narrower than a bin collapse, so there may be fewer than ``bands``.
+    """
+    edges = np.geomspace(MIN_FREQ, sample_rate / 2, bands + 1)[:-1]
+    starts = np.unique(np.round(edges * n_fft / sample_rate).astype(int))
+    starts.setflags(write=False)
+    return starts
+
+@lru_cache(maxsize=8)
+def _full_scale_power(n_fft: int) -> float:
+    # Peak bin power of a full-scale sine through the analysis window
+    return (stft_window(n_fft).sum() / 2) ** 2
+
+
+class SpectrumAnalyzer:
+    """
+    Rolling STFT of whatever is being played. ``feed`` only queues the block
+    (and drops it if the analyzer has fallen behind), so it is safe to call
+    from the audio callback; a worker thread does the FFTs, a batch of hops
+    at a time, and reduces each spectrum to DISPLAY_BANDS log-spaced bands.
+    The display reads copies of the latest spectrum and the spectrogram
+    history through ``snapshot``.
+    """
+    def __init__(self, sample_rate: int, n_fft: int = ANALYZER_FFT, hop: int = ANALYZER_HOP,
+                 bands: int = DISPLAY_BANDS, history: int = HISTORY_ROWS):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop = hop
+        self.starts = display_bands(sample_rate, n_fft, bands)
+
+        self.spectrum = np.full(len(self.starts), DISPLAY_FLOOR_DB)
+        self.spectrogram = np.full((history, len(self.starts)), DISPLAY_FLOOR_DB)
+        self._row = 0  # next spectrogram row to write; rows wrap around
+        self._tail = np.zeros(0)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self._thread = None
+
+    # ------------------- Worker -------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def feed(self, block: np.ndarray):
+        """Queues an (n, channels) block for analysis; the block must not be modified afterwards."""
+        try:
+            self._queue.put_nowait(block)
+        except queue.Full:
+            pass  # the display skips ahead; playback never waits on it
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                return
+            self.process(block)
+
+    def process(self, block: np.ndarray):
+        """Analyzes every complete hop in ``block`` plus what was left over from the last one."""
+        mono = block.mean(axis=1) if block.ndim == 2 else block
+        data = np.concatenate([self._tail, mono])
+        if len(data) < self.n_fft:
+            self._tail = data
+            return
+        frames = sliding_window_view(data, self.n_fft)[::self.hop]
+        self._tail = data[len(frames) * self.hop:]
+
+        spectrum = np.fft.rfft(frames * stft_window(self.n_fft), axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        bands = np.maximum.reduceat(power, self.starts, axis=1)
+        db = np.maximum(10 * np.log10(bands / _full_scale_power(self.n_fft) + 1e-20), DISPLAY_FLOOR_DB)
+
+        with self._lock:
+            self.spectrum = np.maximum(db[-1], self.spectrum - FALL_DB * len(db))
+            rows = (self._row + np.arange(len(db))) % len(self.spectrogram)
+            self.spectrogram[rows] = db
+            self._row = (self._row + len(db)) % len(self.spectrogram)
+
+    def snapshot(self):
+        """(spectrum, spectrogram) in dBFS; spectrogram rows run oldest to newest."""
+        with self._lock:
+            return self.spectrum.copy(), np.roll(self.spectrogram, -self._row, axis=0)
+
+    def band_frequencies(self) -> np.ndarray:
+        """Lower edge of each display band in Hz."""
+        return self.starts * self.sample_rate / self.n_fft
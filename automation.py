@@ -0,0 +1,20 @@
+import numpy as np
+
+AUTOMATABLE = ["filter_freq", "distortion", "volume", "pan"]
+
+def automation_values(points: list, idx: np.ndarray, length: int) -> np.ndarray:
+    """
+    Value of a [position 0-1, value] breakpoint curve at sample indices ``idx``
+    of a ``length``-sample layer; linear between breakpoints, held at the ends.
+    """
+    points = sorted(points)
+    positions = [p for p, _ in points]
+    values = [v for _, v in points]
+    return np.interp(np.asarray(idx) / max(length, 1), positions, values)
+
+def check_automation(layer):
+    for name, points in layer.automation.items():
+        if name not in AUTOMATABLE:
+            raise ValueError(f"{layer.name}: {name!r} can't be automated")
+        if not points:
+            raise ValueError(f"{layer.name}: automation for {name!r} has no breakpoints")
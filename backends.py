@@ -0,0 +1,146 @@
+import os
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from abc import ABC, abstractmethod
+
+import legacy_synth
+from synth import SAMPLE_RATE, generate_final_wave
+from features import log_mel_spectrogram, spectral_distance
+from preset_manager import PresetManager
+
+class RenderBackend(ABC):
+    """
+    A synthesis engine behind one call: ``render`` turns layers (and buses and
+    master dynamics, where the engine has them) into a normalized (n, 2)
+    stereo buffer.
+    """
+    name = ""
+
+    @abstractmethod
+    def render(self, layers: list, buses: list = None, sample_rate: int = SAMPLE_RATE, dynamics=None) -> np.ndarray:
+        ...
+
+
+class SynthBackend(RenderBackend):
+    """
+    The synth.py engine, optionally through a RenderCache (whole mixes, on
+    disk) and a LayerCache (per-layer parts, in memory), which renders the
+    mixes the RenderCache misses.
+    """
+    name = "synth"
+
+    def __init__(self, cache=None, layer_cache=None):
+        self.cache = cache
+        self.layer_cache = layer_cache
+
+    def render(self, layers: list, buses: list = None, sample_rate: int = SAMPLE_RATE, dynamics=None) -> np.ndarray:
+        render = self.layer_cache.final_wave if self.layer_cache is not None else generate_final_wave
+        if self.cache is not None:
+            return self.cache.final_wave(layers, buses=buses, sample_rate=sample_rate, dynamics=dynamics,
+                                         render=render)
+        return render(layers, buses=buses, sample_rate=sample_rate, dynamics=dynamics)
+
+
+class LegacyBackend(RenderBackend):
+    """
+    The original main2.py engine: mono, no sweeps, noise, panning, routing,
+    buses or dynamics, effects in its own order, layers averaged. The mono mix is sent
+    to both channels.
+    """
+    name = "legacy"
+
+    def render(self, layers: list, buses: list = None, sample_rate: int = SAMPLE_RATE, dynamics=None) -> np.ndarray:
+        mono = legacy_synth.generate_final_wave(layers, sample_rate)
+        return np.repeat(mono[:, None], 2, axis=1)
+
+
+BACKENDS = {"synth": SynthBackend, "legacy": LegacyBackend}
+
+def make_backend(name: str, **kwargs) -> RenderBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown render backend {name!r}")
+    return BACKENDS[name](**kwargs)
+
+# ------------------- A/B comparison -------------------
+def measure(backend: RenderBackend, layers: list, buses: list = None, sample_rate: int = SAMPLE_RATE,
+            repeat: int = 3):
+    """(wave, best time in s, peak traced memory in bytes) of rendering ``layers``."""
+    tracemalloc.start()
+    try:
+        wave = backend.render(layers, buses, sample_rate)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.render(layers, buses, sample_rate)
+        best = min(best, time.perf_counter() - start)
+    return wave, best, peak
+
+def compare_backends(presets, names=("synth", "legacy"), sample_rate: int = SAMPLE_RATE, repeat: int = 3) -> list:
+    """
+    Renders each (name, layers, buses) preset through every backend. Returns
+    one row per preset: {"preset", "<backend>_time", "<backend>_memory",
+    "<backend>_error", "distance"}, where distance is the log-mel spectral
+    distance (dB) between the first two backends' mono downmixes.
+    Presets are rendered with seed 0 where they leave it unset, so runs are
+    repeatable.
+    """
+    backends = [make_backend(name) for name in names]
+    rows = []
+    for preset, layers, buses in presets:
+        for layer in layers:
+            if layer.seed is None:
+                layer.seed = 0
+        row, waves = {"preset": preset}, []
+        for backend in backends:
+            try:
+                wave, seconds, peak = measure(backend, layers, buses, sample_rate, repeat)
+            except Exception as e:
+                row[f"{backend.name}_error"] = f"{type(e).__name__}: {e}"
+                waves.append(None)
+                continue
+            row[f"{backend.name}_time"] = seconds
+            row[f"{backend.name}_memory"] = peak
+            waves.append(wave.mean(axis=1))
+        if len(waves) > 1 and waves[0] is not None and waves[1] is not None:
+            row["distance"] = spectral_distance(log_mel_spectrogram(waves[0], sample_rate),
+                                                log_mel_spectrogram(waves[1], sample_rate))
+        rows.append(row)
+    return rows
+
+def print_comparison(rows: list, names=("synth", "legacy")):
+    header = f"{'preset':<24}" + "".join(f"{name + ' ms':>12}{name + ' MiB':>12}" for name in names) + f"{'dB diff':>10}"
+    print(header)
+    for row in rows:
+        line = f"{row['preset']:<24}"
+        for name in names:
+            if f"{name}_error" in row:
+                line += f"{'error':>12}{'':>12}"
+            else:
+                line += f"{row[name + '_time'] * 1e3:>12.1f}{row[name + '_memory'] / 2**20:>12.2f}"
+        line += f"{row['distance']:>10.1f}" if "distance" in row else f"{'-':>10}"
+        print(line)
+    for row in rows:
+        for name in names:
+            if f"{name}_error" in row:
+                print(f"{row['preset']} ({name}): {row[name + '_error']}")
+
+def load_preset_dir(preset_dir: str):
+    for name in sorted(os.listdir(preset_dir)):
+        path = os.path.join(preset_dir, name)
+        if name.endswith(".json"):
+            layers = PresetManager.load_preset(path)
+            if layers:
+                yield name, layers, PresetManager.load_buses(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="A/B render presets through each backend")
+    parser.add_argument("preset_dir", nargs="?", default="presets")
+    parser.add_argument("--backends", nargs=2, choices=list(BACKENDS), default=["synth", "legacy"])
+    parser.add_argument("--rate", type=int, default=SAMPLE_RATE)
+    args = parser.parse_args()
+    print_comparison(compare_backends(load_preset_dir(args.preset_dir), args.backends, args.rate), args.backends)
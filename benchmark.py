@@ -0,0 +1,397 @@
+import os
+import sys
+import glob
+import time
+import struct
+import numpy as np
+
+from effects import lowpass_filter, distortion, bitcrusher, multitap_reverb
+from layer import Layer
+from preset_manager import PresetManager
+from synth import SAMPLE_RATE, REVERB_TAPS, LayerStream, apply_adsr, generate_layer_wave, generate_final_wave
+from timeline import Event, Timeline, render_sounds, render_timeline
+from variants import make_variants
+from analyzer import SpectrumAnalyzer
+from backends import compare_backends, print_comparison
+from dynamics import MasterDynamics, DynamicsStream
+from synth import stream_final_wave
+import random_batch
+from encoders import (CODECS, IMA_STEPS, encode, write_encoded_wav, read_encoded_wav, mulaw_encode, mulaw_decode,
+                      alaw_encode, alaw_decode, ima_adpcm_encode, ima_adpcm_decode, ima_block_align,
+                      ima_samples_per_block)
+from export import to_pcm16
+from render_cache import LayerCache
+from model import LayerModel
+from bus import Bus
+
+def best_time(fn, repeat: int = 20) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def load_presets(preset_dir: str):
+    for path in sorted(glob.glob(os.path.join(preset_dir, "*.json"))):
+        layers = PresetManager.load_preset(path)
+        if layers:
+            yield os.path.basename(path), layers
+
+# ------------------- Block-tiled vs full-buffer post-processing -------------------
+def unfused_layer_wave(layer, seed=0) -> np.ndarray:
+    # The full-buffer chain: one pass and one temporary per stage
+    stream = LayerStream(layer, seed)
+    wave = stream._oscillator(0, stream.length)
+    wave = wave * apply_adsr(stream.length, layer.adsr, layer.adsr_curve)
+    if layer.filter_freq > 0: wave = lowpass_filter(wave, layer.filter_freq, SAMPLE_RATE)
+    if layer.distortion > 0: wave = distortion(wave, layer.distortion)
+    if layer.bitcrusher > 0: wave = bitcrusher(wave, layer.bitcrusher)
+    if layer.reverb > 0: wave = multitap_reverb(wave, REVERB_TAPS, layer.reverb, SAMPLE_RATE)
+    wave = wave * layer.volume
+    left = wave * np.sqrt(1 - layer.pan)
+    right = wave * np.sqrt(layer.pan)
+    return np.column_stack([left, right])
+
+def bench_fused(preset_dir: str, dur: float = None):
+    title = "In-place block chain vs full-buffer passes"
+    print(title + (f" (layers stretched to {dur:g} s)" if dur else ""))
+    print(f"{'preset':<16}{'full ms':>12}{'block ms':>12}{'speedup':>10}{'max diff':>12}")
+    for name, layers in load_presets(preset_dir):
+        if dur:
+            for layer in layers:
+                layer.dur = dur
+        def unfused():
+            return [unfused_layer_wave(layer, seed=i) for i, layer in enumerate(layers)]
+        def fused():
+            return [generate_layer_wave(layer, seed=i) for i, layer in enumerate(layers)]
+        # Up to ~4e-8 on noise layers: the block chain applies the envelope to the float32 noise in place,
+        # where the full-buffer chain promotes it to float64 first
+        diff = max(np.max(np.abs(a - b)) for a, b in zip(unfused(), fused()))
+        t_unfused, t_fused = best_time(unfused), best_time(fused)
+        print(f"{name:<16}{t_unfused * 1e3:>12.2f}{t_fused * 1e3:>12.2f}{t_unfused / t_fused:>10.2f}{diff:>12.2e}")
+
+# ------------------- Automation overhead -------------------
+def bench_automation(dur: float = 5.0):
+    # The same layer with static parameters and with all of them automated
+    layer = Layer.from_dict({"waveform": "Sawtooth", "freq": 110, "freq_end": 110, "dur": dur,
+                             "distortion": 40, "filter_freq": 2000, "seed": 0})
+    t_static = best_time(lambda: generate_layer_wave(layer), 5)
+    layer.automation = {"filter_freq": [[0, 200], [1, 8000]], "distortion": [[0, 0], [1, 80]],
+                        "volume": [[0, 1], [1, 0.2]], "pan": [[0, 0], [1, 1]]}
+    t_auto = best_time(lambda: generate_layer_wave(layer), 5)
+    print(f"Automation ({dur:g} s layer): static {t_static * 1e3:.2f} ms, "
+          f"automated {t_auto * 1e3:.2f} ms ({t_auto / t_static:.2f}x)")
+
+# ------------------- Silence skipping -------------------
+def bench_silence(dur: float = 5.0):
+    # A short hit in a long layer: only the decay and the effect tails get rendered
+    layer = Layer.from_dict({"waveform": "Square", "dur": dur, "filter_freq": 2000, "reverb": 30, "seed": 0,
+                             "adsr": {"Attack": 2, "Decay": 80, "Sustain": 0, "Release": 100}})
+    stream = LayerStream(layer)
+    t_sparse = best_time(lambda: generate_layer_wave(layer), 5)
+    layer.adsr["Sustain"] = 1
+    t_full = best_time(lambda: generate_layer_wave(layer), 5)
+    print(f"Silence skipping ({dur:g} s layer, {stream.active / stream.length:.1%} active): "
+          f"{t_full * 1e3:.2f} ms -> {t_sparse * 1e3:.2f} ms")
+
+def bench_timeline(events: int = 200):
+    # Many events over a few distinct sounds: cost should track the sounds, not the events
+    rng = np.random.default_rng(0)
+    presets = ["Laser", "Riser", "Explosion"]
+    timeline = Timeline([Event(rng.choice(presets), rng.uniform(0, 10), rng.uniform(0.3, 1.0),
+                               rng.choice([0, -5, 7]), 1) for _ in range(events)])
+    sounds = len({event.sound_key() for event in timeline.events})
+    t_sounds = best_time(lambda: render_sounds(timeline), 3)
+    t_total = best_time(lambda: render_timeline(timeline), 3)
+    t_naive = best_time(lambda: [generate_final_wave(timeline.load_sound(e.preset)[0]) for e in timeline.events], 1)
+    print(f"Timeline ({events} events, {sounds} sounds): {t_total * 1e3:.1f} ms "
+          f"({t_sounds * 1e3:.1f} ms rendering), rendering every event: {t_naive * 1e3:.1f} ms")
+
+def bench_variants(preset_dir: str, pitches=(-7, -5, -3, 0, 3, 5, 7, 12), stretches=(0.75, 1.0, 1.5)):
+    # Every preset stacked into one long multi-layer patch, varied in pitch and length
+    layers = [Layer.from_dict({**layer.to_dict(), "dur": 2.0})
+              for _, preset in load_presets(preset_dir) for layer in preset]
+    count = len(pitches) * len(stretches)
+
+    def rerender():
+        for semitones in pitches:
+            ratio = 2 ** (semitones / 12)
+            shifted = [Layer.from_dict({**layer.to_dict(), "freq": layer.freq * ratio,
+                                        "freq_end": layer.freq_end * ratio}) for layer in layers]
+            generate_final_wave(shifted)
+
+    wave = generate_final_wave(layers)
+    t_render = best_time(rerender, 1) * count / len(pitches)  # one more full render per stretch
+    t_variants = best_time(lambda: make_variants(wave, pitches, stretches), 1)
+    print(f"{count} variants of a {len(layers)}-layer patch: re-rendering {t_render * 1e3:.0f} ms, "
+          f"from one render {t_variants * 1e3:.0f} ms")
+
+def bench_analyzer(seconds: float = 30.0, block_size: int = 1024):
+    # The analyzer has to keep up with playback on one core, a callback block at a time
+    wave = np.random.default_rng(0).standard_normal((int(seconds * SAMPLE_RATE), 2)) * 0.1
+    analyzer = SpectrumAnalyzer(SAMPLE_RATE)
+    start = time.perf_counter()
+    for pos in range(0, len(wave), block_size):
+        analyzer.process(wave[pos:pos + block_size])
+    elapsed = time.perf_counter() - start
+    print(f"Spectrum analyzer: {seconds / elapsed:.0f}x real time "
+          f"({elapsed / seconds * 100:.2f}% of one core during playback)")
+
+def bench_backends(preset_dir: str):
+    presets = [(name, layers, PresetManager.load_buses(os.path.join(preset_dir, name)))
+               for name, layers in load_presets(preset_dir)]
+    print_comparison(compare_backends(presets))
+
+def check_dynamics(seconds: float = 2.0):
+    """Asserts that the limited output stays under the ceiling, keeps its length and ignores block sizes."""
+    rng = np.random.default_rng(0)
+    n = int(seconds * SAMPLE_RATE) + 17  # not a whole number of gain steps
+    levels = rng.uniform(0.05, 3.0, n // 2205 + 1).repeat(2205)[:n]  # a new level every 50 ms
+    wave = rng.standard_normal((n, 2)) * levels[:, None]
+    for compressor, limiter in ((True, True), (False, True), (True, False)):
+        dynamics = MasterDynamics.from_dict({"compressor": compressor, "limiter": limiter})
+        outputs = []
+        for block_size in (1, 31, 4096, len(wave)):
+            stream = DynamicsStream(dynamics, SAMPLE_RATE, 2)
+            blocks = [stream.process(wave[pos:pos + block_size]) for pos in range(0, len(wave), block_size)]
+            outputs.append(np.concatenate(blocks + [stream.flush()]))
+        for out in outputs:
+            assert out.shape == wave.shape and np.allclose(out, outputs[-1], rtol=0, atol=1e-12)
+        if limiter:
+            assert np.abs(outputs[-1]).max() <= 10 ** (dynamics.ceiling / 20) + 1e-12
+    print("Dynamics checks passed")
+
+def bench_dynamics(seconds: float = 30.0, block_size: int = 4096):
+    wave = np.random.default_rng(0).standard_normal((int(seconds * SAMPLE_RATE), 2)) * 0.3
+
+    def run():
+        stream = DynamicsStream(MasterDynamics(), SAMPLE_RATE, 2)
+        for pos in range(0, len(wave), block_size):
+            stream.process(wave[pos:pos + block_size])
+        stream.flush()
+
+    t = best_time(run, 3)
+    print(f"Master dynamics: {t / len(wave) * 1e9:.0f} ns/sample ({seconds / t:.0f}x real time)")
+
+    # Streaming export: two-pass peak normalize vs one pass through the limiter
+    layers = [Layer.from_dict({**layer.to_dict(), "seed": 0}) for layer in PresetManager.load_preset("presets/riser.json")]
+    t_two = best_time(lambda: sum(len(b) for b in stream_final_wave(layers)), 5)
+    t_one = best_time(lambda: sum(len(b) for b in stream_final_wave(layers, None, dynamics=MasterDynamics())), 5)
+    print(f"Streaming riser.json: normalized (two passes) {t_two * 1e3:.1f} ms, "
+          f"limited (one pass) {t_one * 1e3:.1f} ms")
+
+def bench_random_batch(count: int = 300):
+    rng = np.random.default_rng(0)
+    payloads = [[layer.to_dict() for layer in random_batch.random_patch(rng)] for _ in range(count)]
+    start = time.perf_counter()
+    results = [random_batch.draft_metrics(p) for p in payloads]
+    elapsed = time.perf_counter() - start
+    rms_db, crest_db, flatness = (np.array([r[i] for r in results]) for i in range(3))
+    rejected = np.sum(~np.isfinite(random_batch.quality(rms_db, crest_db, flatness)))
+    print(f"Random drafts: {count / elapsed:.0f} patches/s per core, {rejected}/{count} rejected")
+
+# ------------------- Per-layer render cache -------------------
+def _edit_patch() -> tuple[list[Layer], list[Bus]]:
+    # A modulator feeding a carrier, a layer on a bus and an independent one
+    layers = [Layer.from_dict(d) for d in (
+        {"name": "Mod", "waveform": "Sine", "freq": 30, "freq_end": 30, "dur": 1.0, "volume": 0.0, "seed": 1},
+        {"name": "Carrier", "waveform": "Sawtooth", "freq": 220, "freq_end": 440, "dur": 2.0, "filter_freq": 3000,
+         "mod_sources": [{"source": "Mod", "type": "FM", "depth": 200}], "sends": {"Verb": 40}, "seed": 2},
+        {"name": "Noise", "waveform": "Noise", "dur": 1.5, "reverb": 20, "seed": 3},
+        {"name": "Sub", "waveform": "Sine", "freq": 60, "freq_end": 60, "dur": 2.5, "distortion": 30, "seed": 4})]
+    return layers, [Bus("Verb")]
+
+def check_layer_cache():
+    """Asserts that a one-field edit re-renders only that layer (and what it modulates)."""
+    model = LayerModel(*_edit_patch())
+    cache = LayerCache()
+    model.subscribe(cache.invalidate)
+    cache.final_wave(model.layers, buses=model.buses)
+    parts = {key: entry[0] for key, entry in cache._entries.items()}
+    edits = [(3, "volume", 0.5, [3]), (2, "filter_freq", 900, [2]), (0, "freq", 35, [0, 1])]
+    for index, field, value, rendered in edits:
+        model.set(index, field, value)
+        wave = cache.final_wave(model.layers, buses=model.buses)
+        assert cache.rendered == rendered, (field, cache.rendered)
+        assert np.array_equal(wave, generate_final_wave(model.layers, buses=model.buses)), field
+    untouched = [key for key, part in parts.items() if key in cache._entries and cache._entries[key][0] is part]
+    assert len(untouched) >= 2  # the Sub and Noise parts of the first render are never replaced
+    model.replace(*_edit_patch())  # a structural change re-keys every layer, but equal states still hit
+    cache.final_wave(model.layers, buses=model.buses)
+    assert cache.rendered == [], cache.rendered
+    print("Layer cache checks passed")
+
+def bench_layer_cache(edits: int = 10):
+    # A slider drag on one layer: full mix renders vs renders through the per-layer cache
+    model = LayerModel(*_edit_patch())
+    cache = LayerCache()
+    model.subscribe(cache.invalidate)
+    cache.final_wave(model.layers, buses=model.buses)
+
+    def drag(render):
+        for step in range(edits):
+            model.set(3, "distortion", 30 + step)
+            render(model.layers, buses=model.buses)
+    t_full = best_time(lambda: drag(generate_final_wave), 3)
+    t_cached = best_time(lambda: drag(cache.final_wave), 3)
+    print(f"One-layer edits ({len(model.layers)} layers): full mix {t_full / edits * 1e3:.1f} ms, "
+          f"per-layer cache {t_cached / edits * 1e3:.1f} ms per edit")
+
+# ------------------- Codecs -------------------
+# Scalar G.711 and IMA-ADPCM written straight from the reference C code, one
+# sample at a time, so the vectorized encoders are checked against code that
+# shares nothing with them but the standard step table.
+def _reference_mulaw(sample: int) -> int:
+    x, mask = sample >> 2, 0xFF
+    if x < 0:
+        x, mask = -x, 0x7F
+    x = min(x, 8159) + 0x21
+    for segment, end in enumerate((0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)):
+        if x <= end:
+            return ((segment << 4) | ((x >> (segment + 1)) & 0x0F)) ^ mask
+    return 0x7F ^ mask
+
+def _reference_ulaw2linear(code: int) -> int:
+    code = ~code & 0xFF
+    t = (((code & 0x0F) << 3) + 0x84) << ((code & 0x70) >> 4)
+    return 0x84 - t if code & 0x80 else t - 0x84
+
+def _reference_alaw(sample: int) -> int:
+    x = sample >> 3
+    mask = 0xD5
+    if x < 0:
+        x, mask = -x - 1, 0x55
+    for segment, end in enumerate((0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF)):
+        if x <= end:
+            return ((segment << 4) | ((x >> (segment if segment > 1 else 1)) & 0x0F)) ^ mask
+    return 0x7F ^ mask
+
+def _reference_alaw2linear(code: int) -> int:
+    code ^= 0x55
+    t = (code & 0x0F) << 4
+    segment = (code & 0x70) >> 4
+    if segment == 0:
+        t += 8
+    else:
+        t = (t + 0x108) << (segment - 1)
+    return t if code & 0x80 else -t
+
+def _reference_ima_decode(data: bytes, channels: int, block_align: int) -> np.ndarray:
+    out = [[] for _ in range(channels)]
+    for start in range(0, len(data) - block_align + 1, block_align):
+        block = data[start:start + block_align]
+        state = [list(struct.unpack_from("<hB", block, 4 * c)) for c in range(channels)]
+        for c in range(channels):
+            out[c].append(state[c][0])
+        for word in range(4 * channels, block_align, 4 * channels):
+            for c in range(channels):
+                for byte in block[word + 4 * c:word + 4 * c + 4]:
+                    for code in (byte & 0x0F, byte >> 4):
+                        predictor, index = state[c]
+                        step = int(IMA_STEPS[index])
+                        diff = step >> 3
+                        if code & 4: diff += step
+                        if code & 2: diff += step >> 1
+                        if code & 1: diff += step >> 2
+                        predictor = predictor - diff if code & 8 else predictor + diff
+                        state[c] = [max(-32768, min(32767, predictor)),
+                                    max(0, min(88, index + (-1, -1, -1, -1, 2, 4, 6, 8)[code & 7]))]
+                        out[c].append(state[c][0])
+    return np.array(out, dtype=np.int16).T
+
+def _snr_db(reference: np.ndarray, decoded: np.ndarray) -> float:
+    error = decoded.astype(float) - reference
+    return 10 * np.log10(np.sum(reference ** 2) / max(np.sum(error ** 2), 1e-12))
+
+def check_codecs(path: str = "_check_codec.wav"):
+    """Asserts the encoders against the scalar references, error bounds and odd lengths."""
+    every = np.arange(-32768, 32768).astype(np.int16)
+    codes = np.arange(256, dtype=np.uint8)
+    assert mulaw_encode(every).tolist() == [_reference_mulaw(int(x)) for x in every]
+    assert alaw_encode(every).tolist() == [_reference_alaw(int(x)) for x in every]
+    assert mulaw_decode(codes).tolist() == [_reference_ulaw2linear(int(c)) for c in codes]
+    assert alaw_decode(codes).tolist() == [_reference_alaw2linear(int(c)) for c in codes]
+    try:
+        import audioop  # standard library up to Python 3.12
+    except ImportError:
+        audioop = None
+    if audioop is not None:
+        assert mulaw_encode(every).tobytes() == audioop.lin2ulaw(every.tobytes(), 2)
+        assert alaw_encode(every).tobytes() == audioop.lin2alaw(every.tobytes(), 2)
+
+    # Smooth signal: a sine per channel, 220 Hz apart, at -6 dBFS
+    t = np.arange(SAMPLE_RATE // 4) / SAMPLE_RATE
+    for channels in (1, 2, 6):
+        pcm = to_pcm16(np.stack([0.5 * np.sin(2 * np.pi * 220 * (c + 1) * t) for c in range(channels)], axis=1))
+        reference = pcm.astype(float)
+        align = ima_block_align(channels, SAMPLE_RATE)
+        data = ima_adpcm_encode(pcm, align)
+        decoded = ima_adpcm_decode(data, channels, align, len(pcm))
+        assert np.array_equal(decoded, _reference_ima_decode(data, channels, align)[:len(pcm)]), channels
+        for codec, out, min_snr, max_error in (("mulaw", mulaw_decode(mulaw_encode(pcm)), 35, 1024),
+                                               ("alaw", alaw_decode(alaw_encode(pcm)), 35, 512),
+                                               ("ima_adpcm", decoded, 35, 1024)):
+            assert _snr_db(reference, out) >= min_snr, (codec, channels, _snr_db(reference, out))
+            assert np.max(np.abs(out - reference)) <= max_error, (codec, channels)
+
+    # Odd frame counts, partial last blocks and non-default block sizes
+    rng = np.random.default_rng(0)
+    for channels in (1, 2, 6):
+        for align in (8 * channels, ima_block_align(channels, 11025), ima_block_align(channels, SAMPLE_RATE)):
+            per_block = ima_samples_per_block(align, channels)
+            for frames in (1, 7, per_block - 1, per_block, per_block + 1, 3 * per_block + 5):
+                pcm = to_pcm16(0.3 * np.sin(np.cumsum(rng.uniform(0, 0.2, (frames, channels)), axis=0)))
+                data = ima_adpcm_encode(pcm, align)
+                assert len(data) == -(-frames // per_block) * align
+                decoded = ima_adpcm_decode(data, channels, align, frames)
+                assert decoded.shape == pcm.shape
+                assert np.array_equal(decoded, _reference_ima_decode(data, channels, align)[:frames])
+                assert np.array_equal(decoded[::per_block], pcm[::per_block])  # block headers are exact
+        wave = 0.3 * np.sin(np.linspace(0, 300, 12345))[:, None].repeat(channels, axis=1)
+        try:
+            for codec in CODECS:
+                write_encoded_wav(path, wave, 22050, codec)
+                rate, decoded = read_encoded_wav(path)
+                assert rate == 22050 and decoded.shape == wave.shape, (codec, channels)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+    print("Codec checks passed")
+
+def bench_codecs(preset_dir: str, path: str = "_bench_codec.wav"):
+    # Every preset rendered once, concatenated, then encoded and decoded through each codec
+    waves = [generate_final_wave(layers) for _, layers in load_presets(preset_dir)]
+    wave = np.concatenate(waves)
+    reference = to_pcm16(wave).astype(float)
+    seconds = len(wave) / SAMPLE_RATE
+    try:
+        for codec in CODECS:
+            t = best_time(lambda: encode(wave, codec, SAMPLE_RATE), repeat=3)
+            write_encoded_wav(path, wave, SAMPLE_RATE, codec)
+            size = os.path.getsize(path)
+            error = read_encoded_wav(path)[1] - reference
+            snr = 10 * np.log10(np.sum(reference ** 2) / max(np.sum(error ** 2), 1e-12))
+            print(f"{codec:<10} encode {seconds / t:7.0f}x real time, {size / 1024:7.0f} KiB, "
+                  f"round-trip SNR {snr:6.1f} dB, max error {np.max(np.abs(error)):.0f} LSB")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+if __name__ == "__main__":
+    preset_dir = sys.argv[1] if len(sys.argv) > 1 else "presets"
+    bench_fused(preset_dir)
+    bench_fused(preset_dir, dur=5.0)
+    bench_automation()
+    bench_silence()
+    bench_timeline()
+    bench_variants(preset_dir)
+    bench_analyzer()
+    bench_backends(preset_dir)
+    check_dynamics()
+    bench_dynamics()
+    bench_random_batch()
+    check_layer_cache()
+    bench_layer_cache()
+    check_codecs()
+    bench_codecs(preset_dir)
@@ -0,0 +1,31 @@
+class Bus:
+    """
+    Send/return bus: layers send part of their post-fader signal to it by name,
+    and its effects run once on the summed sends.
+    """
+    def __init__(self, name="Reverb"):
+        self.name = name
+
+        # Effects
+        self.filter_freq = 0  # 0 = off
+        self.reverb = 100  # 100 = fully wet return
+
+        # Output
+        self.volume = 1.0
+
+    # ------------------- Serialization -------------------
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "filter_freq": self.filter_freq,
+            "reverb": self.reverb,
+            "volume": self.volume
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bus = cls(data.get("name", "Reverb"))
+        bus.filter_freq = data.get("filter_freq", 0)
+        bus.reverb = data.get("reverb", 100)
+        bus.volume = data.get("volume", 1.0)
+        return bus
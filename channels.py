@@ -0,0 +1,56 @@
+import numpy as np
+
+# Channel order per layout; ambisonics is first order in ACN order with SN3D weights
+LAYOUTS = {
+    "Mono": ["M"],
+    "Stereo": ["L", "R"],
+    "5.1": ["L", "R", "C", "LFE", "Ls", "Rs"],
+    "7.1": ["L", "R", "C", "LFE", "Ls", "Rs", "Lb", "Rb"],
+    "FOA": ["W", "Y", "Z", "X"],
+}
+
+# BS.1770 loudness weights; the LFE and the directional ambisonic channels don't count
+LOUDNESS_WEIGHTS = {"Ls": 1.41, "Rs": 1.41, "Lb": 1.41, "Rb": 1.41, "LFE": 0.0, "Y": 0.0, "Z": 0.0, "X": 0.0}
+
+def channel_names(layout: str) -> list[str]:
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown channel layout {layout!r}")
+    return LAYOUTS[layout]
+
+def channel_count(layout: str) -> int:
+    return len(channel_names(layout))
+
+def loudness_weights(layout: str) -> np.ndarray:
+    return np.array([LOUDNESS_WEIGHTS.get(name, 1.0) for name in channel_names(layout)])
+
+def pan_gains(pan, layout: str = "Stereo") -> np.ndarray:
+    """
+    Gain vector placing a source panned ``pan`` (0 = left, 1 = right) in the
+    layout; for a per-sample pan array, one row per sample. Stereo is the
+    sqrt pan law; speaker layouts pan with the same law between the two
+    front speakers around the source (the L-R stage maps to L-C-R when there
+    is a centre); ambisonics encodes a source swept from 90 degrees left to
+    90 degrees right.
+    """
+    pan = np.asarray(pan, dtype=float)
+    names = channel_names(layout)
+    gains = np.zeros(pan.shape + (len(names),))
+    if layout == "Mono":
+        gains[...] = 1.0
+    elif layout == "Stereo":
+        gains[..., 0] = np.sqrt(1 - pan)
+        gains[..., 1] = np.sqrt(pan)
+    elif layout == "FOA":
+        azimuth = np.radians(90 - 180 * pan)
+        gains[..., 0] = 1.0
+        gains[..., 1] = np.sin(azimuth)
+        gains[..., 3] = np.cos(azimuth)
+    else:
+        # Front stage L-C-R: pan 0-0.5 moves L to C, 0.5-1 moves C to R
+        left, centre, right = names.index("L"), names.index("C"), names.index("R")
+        right_half = pan > 0.5
+        x = np.where(right_half, 2 * pan - 1, 2 * pan)
+        gains[..., left] = np.where(right_half, 0, np.sqrt(1 - x))
+        gains[..., centre] = np.where(right_half, np.sqrt(1 - x), np.sqrt(x))
+        gains[..., right] = np.where(right_half, np.sqrt(x), 0)
+    return gains
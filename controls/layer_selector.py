@@ -6,10 +6,11 @@ class LayerSelector(QWidget):
     """
     Dropdown to select active layer and optionally add/remove layers.
     """
-    def __init__(self, layers: list[Layer], change_callback):
+    def __init__(self, model, change_callback):
         super().__init__()
-        self.layers = layers
+        self.model = model
         self.change_callback = change_callback
+        self.clipboard_layer = None
 
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
@@ -37,11 +38,24 @@ class LayerSelector(QWidget):
         # Initialize dropdown
         self.update_selector()
 
+    @property
+    def layers(self):
+        return self.model.layers
+
+    @property
+    def current_index(self):
+        return max(0, self.selector.currentIndex())
+
     # ------------------- Selector -------------------
-    def update_selector(self):
-        self.selector.clear()
-        for i, layer in enumerate(self.layers):
-            self.selector.addItem(f"{i+1}: {getattr(layer,'name','Layer')}")
+    def update_selector(self, index=0):
+        self.selector.blockSignals(True)
+        try:
+            self.selector.clear()
+            for i, layer in enumerate(self.layers):
+                self.selector.addItem(f"{i+1}: {getattr(layer,'name','Layer')}")
+            self.selector.setCurrentIndex(index)
+        finally:
+            self.selector.blockSignals(False)
 
     def _layer_changed(self, index):
         if index >= 0 and index < len(self.layers):
@@ -49,35 +63,34 @@ class LayerSelector(QWidget):
 
     # ------------------- Add / Remove Layers -------------------
     def add_layer(self):
-        new_layer = Layer(name=f"Layer {len(self.layers)+1}")
-        self.layers.append(new_layer)
-        self.update_selector()
-        self.selector.setCurrentIndex(len(self.layers)-1)
-        self.change_callback(len(self.layers)-1)
+        index = len(self.layers)
+        self.model.add_layer(Layer(name=f"Layer {index+1}"))
+        self.update_selector(index)
+        self.change_callback(index)
 
     def remove_layer(self):
         index = self.selector.currentIndex()
         if len(self.layers) <= 1:
             return  # Keep at least one layer
         if index >= 0 and index < len(self.layers):
-            self.layers.pop(index)
-            self.update_selector()
+            self.model.remove_layer(index)
             # Select previous layer if possible
             new_index = max(0, index-1)
-            self.selector.setCurrentIndex(new_index)
+            self.update_selector(new_index)
             self.change_callback(new_index)
 
     def rename_layer(self):
-        layer = self.layers[self.current_index]
-        text, ok = QInputDialog.getText(self, "Rename Layer", "New name:", text=layer.name)
+        index = self.current_index
+        text, ok = QInputDialog.getText(self, "Rename Layer", "New name:", text=self.layers[index].name)
         if ok and text.strip():
-            layer.name = text.strip()
-            self.update_selector()
+            self.model.set(index, "name", text.strip())
+            self.update_selector(index)
 
     def copy_layer(self):
-        self.clipboard_layer = copy.deepcopy(self.layers[self.current_index])
+        self.clipboard_layer = self.layers[self.current_index].to_dict()
 
     def paste_layer(self):
         if self.clipboard_layer:
-            self.layers[self.current_index] = copy.deepcopy(self.clipboard_layer)
-            self.update_selector()
+            index = self.current_index
+            self.model.set_layer(index, Layer.from_dict(copy.deepcopy(self.clipboard_layer)))
+            self.update_selector(index)
@@ -0,0 +1,47 @@
+import numpy as np
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtGui import QPainter, QImage, QColor, QPen, QPolygonF
+from PyQt6.QtCore import QTimer, QPointF, QRectF
+
+from analyzer import DISPLAY_FLOOR_DB
+
+REFRESH_MS = 33  # ~30 fps
+
+class SpectrumView(QWidget):
+    """
+    Live spectrum (top) and scrolling spectrogram (bottom) of a
+    SpectrumAnalyzer. Repaints on a timer from snapshots, so the GUI thread
+    never does any FFT work and never waits on the analyzer for long.
+    """
+    def __init__(self, analyzer):
+        super().__init__()
+        self.analyzer = analyzer
+        self.setMinimumHeight(160)
+        self._image_data = None  # keeps the spectrogram pixels alive while QImage uses them
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update)
+        self.timer.start(REFRESH_MS)
+
+    def paintEvent(self, event):
+        spectrum, spectrogram = self.analyzer.snapshot()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(20, 20, 20))
+        width, height = self.width(), self.height()
+        top = QRectF(0, 0, width, height * 0.4)
+        bottom = QRectF(0, height * 0.4, width, height * 0.6)
+
+        # Spectrum line: bands across, dBFS from the floor to 0 upwards
+        level = 1 - np.clip(spectrum / DISPLAY_FLOOR_DB, 0, 1)
+        xs = np.linspace(0, width, len(spectrum))
+        ys = top.bottom() - level * top.height()
+        painter.setPen(QPen(QColor(80, 200, 120), 1.5))
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs, ys)]))
+
+        # Spectrogram: time runs left to right, low bands at the bottom
+        pixels = (255 * (1 - np.clip(spectrogram / DISPLAY_FLOOR_DB, 0, 1))).astype(np.uint8)
+        self._image_data = np.ascontiguousarray(pixels.T[::-1])
+        rows, cols = self._image_data.shape
+        image = QImage(self._image_data.data, cols, rows, cols, QImage.Format.Format_Grayscale8)
+        painter.drawImage(bottom, image)
+        painter.end()
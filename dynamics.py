@@ -0,0 +1,262 @@
+import numpy as np
+from scipy.signal import lfilter
+from scipy.ndimage import maximum_filter1d
+
+from metering import db_to_gain
+
+MAX_EXPONENT = 600.0  # keeps coeff ** -n inside float64 range in _release
+LOG_GAIN_PER_DB = np.log(10) / 20
+CONTROL_STEP = 32  # samples per gain computation; gains are interpolated linearly in between
+
+def _gain(db: np.ndarray) -> np.ndarray:
+    # db_to_gain for arrays; exp is several times faster than a power of 10
+    return np.exp(db * LOG_GAIN_PER_DB)
+
+def _peak(block: np.ndarray) -> np.ndarray:
+    # Per-sample max over channels; reducing a short axis with .max(axis=1) is far slower
+    peak = np.abs(block[:, 0])
+    for c in range(1, block.shape[1]):
+        np.maximum(peak, np.abs(block[:, c]), out=peak)
+    return peak
+
+def _apply(block: np.ndarray, gain: np.ndarray) -> np.ndarray:
+    # block * gain[:, None] a channel at a time; as in _peak, that is far faster than broadcasting
+    out = np.empty_like(block)
+    for c in range(block.shape[1]):
+        np.multiply(block[:, c], gain, out=out[:, c])
+    return out
+
+def _excess_db(level: np.ndarray, threshold: float, scale: float) -> np.ndarray:
+    # scale * log10(level / threshold) where level is above threshold, else 0
+    return scale * np.log10(np.maximum(level, threshold) / threshold)
+
+def _ramps(offsets: np.ndarray) -> np.ndarray:
+    # (2, step) weights of a control value and the next one for each sample of a step
+    return np.stack([1 - offsets, offsets])
+
+def _interpolate(controls: np.ndarray, ramps: np.ndarray) -> np.ndarray:
+    # ramps.shape[1] samples from each control value towards the next, as one small matrix product
+    return (np.stack([controls[:-1], controls[1:]], axis=1) @ ramps).ravel()
+
+def _one_pole(time_ms: float, sample_rate: int) -> float:
+    return float(np.exp(-1000.0 / (max(time_ms, 1e-3) * sample_rate)))
+
+class _Release:
+    """
+    Peak-hold with exponential release, out[n] = max(x[n], coeff * out[n-1]),
+    without a per-sample loop: out[n] = coeff**n * running max of
+    x[k] * coeff**-k, done in chunks short enough not to overflow. The
+    powers are computed for the longest input seen so far, not up front.
+    """
+    def __init__(self, coeff: float):
+        self.coeff = coeff
+        self._chunk = min(max(1, int(MAX_EXPONENT / -np.log(coeff))) if coeff > 0 else 1, 1 << 16)
+        self._grow = np.ones(1)
+        self.value = 0.0
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        if len(self._grow) < min(len(x), self._chunk):
+            self._grow = self.coeff ** -np.arange(min(len(x), self._chunk), dtype=float)
+        out = np.empty_like(x)
+        step = len(self._grow)
+        for start in range(0, len(x), step):
+            part = x[start:start + step]
+            grow = self._grow[:len(part)]
+            held = np.maximum(np.maximum.accumulate(part * grow), self.value * self.coeff)
+            out[start:start + len(part)] = held / grow
+            self.value = out[start + len(part) - 1]
+        return out
+
+
+class Compressor:
+    """
+    Feed-forward RMS compressor, computed once per ``step`` samples. The mean
+    square of each step (averaged over channels) is tracked by a one-pole
+    filter, turned into dB of gain reduction above ``threshold``, then given
+    an exponential release and a one-pole attack; the gain is interpolated
+    linearly across each step. All filter states carry over between calls.
+    """
+    def __init__(self, sample_rate: int, threshold=-18.0, ratio=4.0, attack=10.0, release=150.0,
+                 makeup=0.0, rms_window=10.0, step: int = CONTROL_STEP):
+        rate = sample_rate / step
+        self.threshold = threshold
+        self._threshold_power = 10 ** (threshold / 10)
+        self.slope = 1 - 1 / ratio
+        self.makeup = makeup
+        p = _one_pole(rms_window, rate)
+        self._rms = ([1 - p], [1, -p])
+        self._rms_zi = np.zeros(1)
+        a = _one_pole(attack, rate)
+        self._attack = ([1 - a], [1, -a])
+        self._attack_zi = np.zeros(1)
+        self._release = _Release(_one_pole(release, rate))
+        self._ramps = _ramps(np.arange(1, step + 1) / step)
+        self._last = _gain(makeup)
+
+    def gain(self, power: np.ndarray) -> np.ndarray:
+        """Per-sample linear gain for steps with mean squares ``power``; advances the detector state."""
+        mean_square, self._rms_zi = lfilter(*self._rms, power, zi=self._rms_zi)
+        reduction = _excess_db(mean_square, self._threshold_power, 10 * self.slope)
+        reduction, self._attack_zi = lfilter(*self._attack, self._release.process(reduction), zi=self._attack_zi)
+        controls = np.concatenate([[self._last], _gain(self.makeup - reduction)])
+        self._last = controls[-1]
+        return _interpolate(controls, self._ramps)
+
+
+class Limiter:
+    """
+    Lookahead peak limiter, computed once per ``step`` samples. The gain
+    reduction needed by each step's peak is held for twice the lookahead
+    (a van Herk sliding max), released exponentially and then averaged over
+    the lookahead, which ramps the gain down before a peak arrives. Each
+    control point covers the steps on both sides of it, so the gain
+    interpolated between two of them still guarantees the delayed output
+    never exceeds ``ceiling`` dBFS.
+    """
+    def __init__(self, sample_rate: int, ceiling=-1.0, lookahead=5.0, release=50.0, step: int = CONTROL_STEP):
+        self.ceiling = ceiling
+        self._ceiling_gain = db_to_gain(ceiling)
+        L = max(1, int(np.ceil(lookahead * sample_rate / (1000 * step))))
+        self._lookahead = L
+        self.latency = (L + 1) * step  # samples; the extra step waits for the next control point
+        self._held_history = np.zeros(2 * L + 1)
+        self._avg_history = np.zeros(L - 1)
+        self._last = 1.0
+        self._ramps = _ramps(np.arange(step) / step)
+        self._release = _Release(_one_pole(release, sample_rate / step))
+
+    def gain(self, peak: np.ndarray) -> np.ndarray:
+        """
+        Per-sample linear gain for the steps leaving the lookahead, given the
+        peaks of the steps entering it.
+        """
+        n, L = len(peak), self._lookahead
+        needed = _excess_db(peak, self._ceiling_gain, 20)
+
+        # held[j] = max of needed over the 2L + 1 steps up to j (centred filter shifted back by L + 1):
+        # control point j starts step j and ends step j - 1, so it is held for both
+        history = np.concatenate([self._held_history, needed])
+        held = maximum_filter1d(history, 2 * L + 2)[L + 1:L + 1 + n]
+        self._held_history = history[-(2 * L + 1):]
+
+        released = np.concatenate([self._avg_history, self._release.process(held)])
+        totals = np.concatenate([[0.0], np.cumsum(released)])
+        reduction = (totals[L:] - totals[:-L]) / L
+        self._avg_history = released[len(released) - (L - 1):]
+
+        controls = np.concatenate([[self._last], _gain(-reduction)])
+        self._last = controls[-1]
+        return _interpolate(controls, self._ramps)
+
+
+class MasterDynamics:
+    """
+    Master-bus dynamics settings: an RMS compressor followed by a lookahead
+    limiter, either of which can be switched off. Serialized with presets.
+    """
+    def __init__(self):
+        # Compressor
+        self.compressor = True
+        self.threshold = -18.0  # dBFS
+        self.ratio = 4.0
+        self.attack = 10.0  # ms
+        self.release = 150.0  # ms
+        self.makeup = 0.0  # dB
+
+        # Limiter
+        self.limiter = True
+        self.ceiling = -1.0  # dBFS
+        self.lookahead = 5.0  # ms
+        self.limiter_release = 50.0  # ms
+
+    # ------------------- Serialization -------------------
+    def to_dict(self):
+        return {
+            "compressor": self.compressor,
+            "threshold": self.threshold,
+            "ratio": self.ratio,
+            "attack": self.attack,
+            "release": self.release,
+            "makeup": self.makeup,
+            "limiter": self.limiter,
+            "ceiling": self.ceiling,
+            "lookahead": self.lookahead,
+            "limiter_release": self.limiter_release
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        dynamics = cls()
+        for key, value in data.items():
+            if hasattr(dynamics, key):
+                setattr(dynamics, key, value)
+        return dynamics
+
+
+class DynamicsStream:
+    """
+    Runs MasterDynamics over consecutive blocks of a mix. Gains are computed
+    once per CONTROL_STEP samples, so a block's last partial step waits for
+    the next block. The limiter's lookahead delay is compensated: the first
+    ``latency`` output samples are dropped and ``flush`` returns the rest, so
+    the output lines up with the input and has the same total length.
+    """
+    def __init__(self, dynamics: MasterDynamics, sample_rate: int, channels: int = 2, step: int = CONTROL_STEP):
+        self.step = step
+        self.compressor = Compressor(sample_rate, dynamics.threshold, dynamics.ratio, dynamics.attack,
+                                     dynamics.release, dynamics.makeup, step=step) if dynamics.compressor else None
+        self.limiter = Limiter(sample_rate, dynamics.ceiling, dynamics.lookahead, dynamics.limiter_release,
+                               step=step) if dynamics.limiter else None
+        self.latency = self.limiter.latency if self.limiter else 0
+        self._skip = self.latency
+        self._pending = np.zeros((0, channels))
+        self._delay = np.zeros((self.latency, channels))
+        self._delay_gain = np.ones(self.latency)
+        self._remaining = 0  # input samples not returned yet
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        self._remaining += len(block)
+        if len(self._pending):
+            block = np.concatenate([self._pending, block])
+        usable = len(block) - len(block) % self.step
+        self._pending = block[usable:].copy()
+        out = self._compensate(self._run(block[:usable]))
+        self._remaining -= len(out)
+        return out
+
+    def flush(self) -> np.ndarray:
+        """The rest of the mix: the last partial step and the lookahead still held back."""
+        n = len(self._pending) + self.latency
+        tail = np.zeros((n + -n % self.step, self._pending.shape[1]))
+        tail[:len(self._pending)] = self._pending
+        self._pending = tail[:0]
+        out = self._compensate(self._run(tail))[:self._remaining]
+        self._remaining = 0
+        return out
+
+    def _run(self, block: np.ndarray) -> np.ndarray:
+        n = len(block)
+        if not n:
+            return block
+        gain = None
+        if self.compressor:
+            steps = block.reshape(n // self.step, -1)
+            gain = self.compressor.gain(np.einsum("ij,ij->i", steps, steps) / steps.shape[1])
+        if self.limiter:
+            peak = _peak(block)
+            if gain is not None:
+                peak *= gain
+            limit = self.limiter.gain(np.maximum.reduceat(peak, np.arange(0, n, self.step)))
+            delayed = np.concatenate([self._delay, block])
+            block, self._delay = delayed[:n], delayed[n:]
+            if gain is not None:
+                delayed_gain = np.concatenate([self._delay_gain, gain])
+                limit *= delayed_gain[:n]
+                self._delay_gain = delayed_gain[n:]
+            gain = limit
+        return _apply(block, gain) if gain is not None else block
+
+    def _compensate(self, block: np.ndarray) -> np.ndarray:
+        skip = min(self._skip, len(block))
+        self._skip -= skip
+        return block[skip:]
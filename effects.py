@@ -1,30 +1,62 @@
 import numpy as np
+from functools import lru_cache
 from scipy.signal import butter, lfilter
 
 def normalize(wave: np.ndarray, eps: float = 1e-12) -> np.ndarray:
     max_val = np.max(np.abs(wave))
     return wave / (max_val + eps) if max_val > 0 else wave
 
-def lowpass_filter(wave: np.ndarray, cutoff: float, sample_rate: int) -> np.ndarray:
+@lru_cache(maxsize=256)
+def butter_lowpass(cutoff: float, sample_rate: int):
     cutoff = min(cutoff, sample_rate / 2 - 1)
-    b, a = butter(2, cutoff / (sample_rate / 2), 'low')
+    return butter(2, cutoff / (sample_rate / 2), 'low')
+
+@lru_cache(maxsize=256)
+def lowpass_tail(cutoff: float, sample_rate: int, floor: float) -> int:
+    """Samples the lowpass keeps ringing after its input stops, until it decays below ``floor``."""
+    _, a = butter_lowpass(cutoff, sample_rate)
+    radius = np.max(np.abs(np.roots(a)))
+    return int(np.ceil(np.log(floor) / np.log(radius))) if radius > 0 else 0
+
+def butter_lowpass_coeffs(cutoff: np.ndarray, sample_rate: int):
+    """
+    butter_lowpass for an array of cutoffs at once, from the closed-form
+    bilinear-transform biquad; returns (b, a) as (len(cutoff), 3) arrays.
+    """
+    cutoff = np.clip(cutoff, 1, sample_rate / 2 - 1)
+    k = np.tan(np.pi * cutoff / sample_rate)
+    k2 = k * k
+    norm = 1 / (1 + np.sqrt(2) * k + k2)
+    b = (k2 * norm)[:, None] * np.array([1.0, 2.0, 1.0])
+    a = np.column_stack([np.ones_like(k), 2 * (k2 - 1) * norm, (1 - np.sqrt(2) * k + k2) * norm])
+    return b, a
+
+def lowpass_filter(wave: np.ndarray, cutoff: float, sample_rate: int) -> np.ndarray:
+    b, a = butter_lowpass(cutoff, sample_rate)
     if wave.ndim == 1:
         return lfilter(b, a, wave)
     return np.column_stack([lfilter(b, a, wave[:, i]) for i in range(wave.shape[1])])
 
-def distortion(wave: np.ndarray, amount: float) -> np.ndarray:
-    amount = np.clip(amount, 0, 100)
-    return np.tanh(wave * (1 + 5 * amount / 100))
+def distortion(wave: np.ndarray, amount, out: np.ndarray = None) -> np.ndarray:
+    # ``amount`` may also be a per-sample array (automation)
+    amount = np.clip(amount, 0, 100) if isinstance(amount, np.ndarray) else min(max(amount, 0), 100)
+    out = np.multiply(wave, 1 + 5 * amount / 100, out=out)
+    return np.tanh(out, out=out)
 
-def bitcrusher(wave: np.ndarray, reduction: float) -> np.ndarray:
-    reduction = np.clip(reduction, 0, 100)
+def bitcrusher(wave: np.ndarray, reduction: float, out: np.ndarray = None) -> np.ndarray:
+    reduction = min(max(reduction, 0), 100)
     steps = max(int(256 - 2.56 * reduction), 2)
-    wave_scaled = (wave + 1) / 2
-    wave_quant = np.floor(wave_scaled * steps) / steps
-    return wave_quant * 2 - 1
+    out = np.add(wave, 1.0, out=out)
+    out /= 2
+    out *= steps
+    np.floor(out, out=out)
+    out /= steps
+    out *= 2
+    out -= 1
+    return out
 
 def multitap_reverb(wave: np.ndarray, taps: list[float], amount: float, sample_rate: int) -> np.ndarray:
-    amount = np.clip(amount, 0, 100)
+    amount = min(max(amount, 0), 100)
     reverb_wave = np.zeros_like(wave)
     for tap in taps:
         delay = int(sample_rate * tap)
@@ -37,3 +69,70 @@ def multitap_reverb(wave: np.ndarray, taps: list[float], amount: float, sample_r
         reverb_wave += temp
     reverb_wave /= max(len(taps), 1)
     return (1 - amount / 100) * wave + (amount / 100) * reverb_wave
+
+# ------------------- Block-wise state -------------------
+class LowpassState:
+    """lowpass_filter over consecutive blocks, carrying the filter state along axis 0."""
+    def __init__(self, cutoff: float, sample_rate: int, channels: int = None):
+        self.b, self.a = butter_lowpass(cutoff, sample_rate)
+        self.zi = np.zeros(2) if channels is None else np.zeros((2, channels))
+
+    def process(self, wave: np.ndarray) -> np.ndarray:
+        wave, self.zi = lfilter(self.b, self.a, wave, axis=0, zi=self.zi)
+        return wave
+
+class MultitapReverb:
+    """multitap_reverb over consecutive blocks, fed from a running delay line; works in place."""
+    def __init__(self, taps: list[float], sample_rate: int, channels: int = None):
+        self.delays = [int(sample_rate * tap) for tap in taps]
+        size = max(self.delays)
+        self.history = np.zeros(size if channels is None else (size, channels))
+
+    def process(self, wave: np.ndarray, amount: float) -> np.ndarray:
+        amount = min(max(amount, 0), 100)
+        h, n = len(self.history), len(wave)
+        ext = np.concatenate([self.history, wave])
+        wet = ext[h - self.delays[0]:h - self.delays[0] + n].copy()
+        for delay in self.delays[1:]:
+            wet += ext[h - delay:h - delay + n]
+        wet /= max(len(self.delays), 1)
+        self.history = ext[-h:]
+        wave *= 1 - amount / 100
+        wet *= amount / 100
+        wave += wet
+        return wave
+
+class TimeVaryingLowpass:
+    """
+    LowpassState whose cutoff follows ``cutoff(idx)``, a function of absolute
+    sample index. The cutoff is sampled every ``step`` samples on a grid fixed
+    to the layer start, so the output doesn't depend on the block size, and
+    each run of steps sharing a (snapped) cutoff is filtered in one call.
+    """
+    def __init__(self, cutoff, sample_rate: int, channels: int = None, step: int = 128):
+        self.cutoff = cutoff
+        self.sample_rate = sample_rate
+        self.step = step
+        self.pos = 0
+        self.zi = np.zeros(2) if channels is None else np.zeros((2, channels))
+
+    def process(self, wave: np.ndarray) -> np.ndarray:
+        start, n = self.pos, len(wave)
+        self.pos += n
+        if n == 0:
+            return wave
+        first, last = start // self.step, (start + n - 1) // self.step
+        cutoffs = self.cutoff((np.arange(first, last + 1) + 0.5) * self.step)
+        # Snapped to a 1/64-octave grid: finer than the ear can follow, and slow
+        # sweeps hold each coefficient set for many steps
+        cutoffs = np.exp2(np.round(np.log2(np.maximum(cutoffs, 1)) * 64) / 64)
+        b, a = butter_lowpass_coeffs(cutoffs, self.sample_rate)
+
+        # Segment edges: block start, each grid step where the cutoff changes, block end
+        changes = np.flatnonzero(cutoffs[1:] != cutoffs[:-1]) + 1
+        edges = np.concatenate([[0], (first + changes) * self.step - start, [n]])
+        out = np.empty_like(wave)
+        for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+            c = 0 if i == 0 else changes[i - 1]
+            out[lo:hi], self.zi = lfilter(b[c], a[c], wave[lo:hi], axis=0, zi=self.zi)
+        return out
@@ -0,0 +1,257 @@
+import os
+import struct
+import argparse
+import numpy as np
+from functools import lru_cache
+
+from synth import SAMPLE_RATE, generate_final_wave
+from preset_manager import PresetManager
+from channels import LAYOUTS
+from export import to_pcm16, write_wav
+
+CODECS = ["pcm16", "mulaw", "alaw", "ima_adpcm"]
+FORMAT_TAGS = {"pcm16": 0x0001, "alaw": 0x0006, "mulaw": 0x0007, "ima_adpcm": 0x0011}
+
+# ------------------- G.711 mu-law / A-law -------------------
+MULAW_BIAS = 0x84
+MULAW_CLIP = 8159  # on the 14-bit magnitude
+MULAW_SEGMENT_ENDS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+ALAW_SEGMENT_ENDS = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+
+def mulaw_encode(pcm: np.ndarray) -> np.ndarray:
+    """16-bit samples to G.711 mu-law bytes, all samples at once."""
+    x = pcm.astype(np.int32) >> 2
+    negative = x < 0
+    x = np.minimum(np.where(negative, -x, x), MULAW_CLIP) + (MULAW_BIAS >> 2)
+    segment = np.searchsorted(MULAW_SEGMENT_ENDS, x)
+    code = np.where(segment >= 8, 0x7F, (np.minimum(segment, 7) << 4) | ((x >> (segment + 1)) & 0x0F))
+    return (code ^ np.where(negative, 0x7F, 0xFF)).astype(np.uint8)
+
+@lru_cache(maxsize=1)
+def _mulaw_table() -> np.ndarray:
+    code = ~np.arange(256) & 0xFF
+    exponent, mantissa = (code >> 4) & 0x07, code & 0x0F
+    magnitude = (((mantissa << 3) + MULAW_BIAS) << exponent) - MULAW_BIAS
+    table = np.where(code & 0x80, -magnitude, magnitude).astype(np.int16)
+    table.setflags(write=False)
+    return table
+
+def mulaw_decode(codes: np.ndarray) -> np.ndarray:
+    return _mulaw_table()[codes]
+
+def alaw_encode(pcm: np.ndarray) -> np.ndarray:
+    """16-bit samples to G.711 A-law bytes, all samples at once."""
+    x = pcm.astype(np.int32) >> 3
+    positive = x >= 0
+    mask = np.where(positive, 0xD5, 0x55)
+    x = np.where(positive, x, -x - 1)
+    segment = np.searchsorted(ALAW_SEGMENT_ENDS, x)
+    shift = np.maximum(segment, 1)
+    code = np.where(segment >= 8, 0x7F, (np.minimum(segment, 7) << 4) | ((x >> shift) & 0x0F))
+    return (code ^ mask).astype(np.uint8)
+
+@lru_cache(maxsize=1)
+def _alaw_table() -> np.ndarray:
+    code = np.arange(256) ^ 0x55
+    segment = (code & 0x70) >> 4
+    t = ((code & 0x0F) << 4) + np.where(segment == 0, 8, 0x108)
+    t = np.where(segment > 1, t << np.maximum(segment - 1, 0), t)
+    table = np.where(code & 0x80, t, -t).astype(np.int16)
+    table.setflags(write=False)
+    return table
+
+def alaw_decode(codes: np.ndarray) -> np.ndarray:
+    return _alaw_table()[codes]
+
+# ------------------- IMA-ADPCM -------------------
+IMA_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+    337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+    2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487,
+    12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767], dtype=np.int32)
+IMA_INDEX_STEPS = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int32)
+
+@lru_cache(maxsize=1)
+def _ima_tables():
+    """
+    Everything the per-sample recursion needs as flat lookups on
+    state = step index * 16 + code: the signed predictor change and the
+    next step index, plus the three quantizer thresholds per step index.
+    """
+    code = np.arange(16)
+    step = IMA_STEPS[:, None]
+    delta = (step >> 3) + (code & 4 > 0) * step + (code & 2 > 0) * (step >> 1) + (code & 1 > 0) * (step >> 2)
+    signed_delta = np.where(code & 8, -delta, delta).astype(np.int32).ravel()
+    next_index = np.clip(np.arange(89)[:, None] + IMA_INDEX_STEPS, 0, 88).astype(np.int32).ravel()
+    return signed_delta, next_index, IMA_STEPS, IMA_STEPS >> 1, IMA_STEPS >> 2
+
+def ima_block_align(channels: int, sample_rate: int) -> int:
+    """The usual WAV block size: 256 bytes per channel, doubled per 11025 Hz."""
+    return 256 * channels * max(1, sample_rate // 11025)
+
+def ima_samples_per_block(block_align: int, channels: int) -> int:
+    # A 4-byte header per channel holds the first sample; every other byte holds two samples
+    return (block_align - 4 * channels) * 2 // channels + 1
+
+def ima_adpcm_encode(pcm: np.ndarray, block_align: int) -> bytes:
+    """
+    (n, channels) 16-bit samples to IMA-ADPCM blocks. Every block restarts
+    the predictor from its header, so all blocks of all channels are encoded
+    together as lanes of one array and the per-sample recursion loops only
+    over positions within a block. Each lane's starting step index is
+    estimated from its own first samples rather than carried over from the
+    previous block, which keeps the lanes independent.
+    """
+    frames, channels = pcm.shape
+    per_block = ima_samples_per_block(block_align, channels)
+    blocks = max(1, -(-frames // per_block))
+    padded = np.zeros((blocks * per_block, channels), dtype=np.int32)
+    padded[:frames] = pcm
+    lanes = padded.reshape(blocks, per_block, channels).transpose(0, 2, 1).reshape(-1, per_block)
+
+    signed_delta, next_index, full, half, quarter = _ima_tables()
+    predictor = lanes[:, 0].copy()
+    start_diff = np.abs(np.diff(lanes[:, :9], axis=1)).mean(axis=1)
+    index = np.clip(np.searchsorted(IMA_STEPS, start_diff) - 1, 0, 88)
+    start_index = index.copy()
+    columns = np.ascontiguousarray(lanes.T)  # one contiguous row per position in the block
+    codes = np.empty((per_block - 1, len(lanes)), dtype=np.int32)
+    for t in range(1, per_block):
+        diff = columns[t] - predictor
+        code = (diff < 0) * 8
+        diff = np.abs(diff)
+        # The standard successive-approximation quantizer, three bits at once for every lane
+        hit = diff >= full[index]
+        diff -= hit * full[index]
+        code += hit * 4
+        hit = diff >= half[index]
+        diff -= hit * half[index]
+        code += hit * 2
+        code += diff >= quarter[index]
+        state = index * 16 + code
+        predictor = np.clip(predictor + signed_delta[state], -32768, 32767)
+        index = next_index[state]
+        codes[t - 1] = code
+    codes = codes.T.astype(np.uint8)
+
+    # Two codes per byte (earlier sample in the low nibble), 4-byte words interleaved by channel
+    packed = (codes[:, 0::2] | (codes[:, 1::2] << 4)).reshape(blocks, channels, -1, 4).transpose(0, 2, 1, 3)
+    header = np.zeros((blocks, channels, 4), dtype=np.uint8)
+    header[..., :2] = lanes[:, 0].astype("<i2").view(np.uint8).reshape(blocks, channels, 2)
+    header[..., 2] = start_index.reshape(blocks, channels)
+    return np.concatenate([header.reshape(blocks, -1), packed.reshape(blocks, -1)], axis=1).tobytes()
+
+def ima_adpcm_decode(data: bytes, channels: int, block_align: int, frames: int = None) -> np.ndarray:
+    """IMA-ADPCM blocks back to (n, channels) 16-bit samples, all blocks decoded together."""
+    per_block = ima_samples_per_block(block_align, channels)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    blocks = len(raw) // block_align
+    raw = raw[:blocks * block_align].reshape(blocks, block_align)
+    header = raw[:, :4 * channels].reshape(blocks, channels, 4)
+    predictor = header[..., :2].copy().view("<i2").reshape(-1).astype(np.int32)
+    index = np.minimum(header[..., 2].reshape(-1).astype(np.int32), 88)
+    packed = raw[:, 4 * channels:].reshape(blocks, -1, channels, 4).transpose(0, 2, 1, 3).reshape(blocks * channels, -1)
+    codes = np.empty((len(packed), per_block - 1), dtype=np.int32)
+    codes[:, 0::2] = packed & 0x0F
+    codes[:, 1::2] = packed >> 4
+
+    signed_delta, next_index = _ima_tables()[:2]
+    columns = np.empty((per_block, len(packed)), dtype=np.int16)
+    columns[0] = predictor
+    codes = np.ascontiguousarray(codes.T)
+    for t in range(1, per_block):
+        state = index * 16 + codes[t - 1]
+        predictor = np.clip(predictor + signed_delta[state], -32768, 32767)
+        index = next_index[state]
+        columns[t] = predictor
+    lanes = columns.T
+    pcm = lanes.reshape(blocks, channels, per_block).transpose(0, 2, 1).reshape(-1, channels)
+    return pcm if frames is None else pcm[:frames]
+
+# ------------------- WAV container -------------------
+def _chunk(tag: bytes, payload: bytes) -> bytes:
+    return tag + struct.pack("<I", len(payload)) + payload + b"\0" * (len(payload) & 1)
+
+def encode(data: np.ndarray, codec: str, sample_rate: int) -> tuple[bytes, bytes]:
+    """(fmt chunk payload, encoded audio) of an (n, channels) float buffer."""
+    if codec not in FORMAT_TAGS:
+        raise ValueError(f"Unknown codec {codec!r}")
+    pcm = to_pcm16(data)
+    channels = pcm.shape[1]
+    tag = FORMAT_TAGS[codec]
+    if codec == "ima_adpcm":
+        align = ima_block_align(channels, sample_rate)
+        per_block = ima_samples_per_block(align, channels)
+        fmt = struct.pack("<HHIIHHHH", tag, channels, sample_rate, sample_rate * align // per_block, align, 4,
+                          2, per_block)
+        return fmt, ima_adpcm_encode(pcm, align)
+    if codec == "pcm16":
+        return struct.pack("<HHIIHH", tag, channels, sample_rate, sample_rate * 2 * channels, 2 * channels, 16), pcm.tobytes()
+    fmt = struct.pack("<HHIIHHH", tag, channels, sample_rate, sample_rate * channels, channels, 8, 0)
+    return fmt, (mulaw_encode(pcm) if codec == "mulaw" else alaw_encode(pcm)).tobytes()
+
+def write_encoded_wav(path: str, data: np.ndarray, sample_rate: int, codec: str = "ima_adpcm"):
+    """Writes an (n, channels) float buffer as a WAV file in ``codec``."""
+    if codec == "pcm16":
+        write_wav(path, data, sample_rate)
+        return
+    fmt, audio = encode(data, codec, sample_rate)
+    body = b"WAVE" + _chunk(b"fmt ", fmt) + _chunk(b"fact", struct.pack("<I", len(data))) + _chunk(b"data", audio)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", len(body)) + body)
+
+def read_encoded_wav(path: str) -> tuple[int, np.ndarray]:
+    """(sample rate, (n, channels) int16) of a WAV written by write_encoded_wav."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    chunks, pos = {}, 12
+    while pos + 8 <= len(raw):
+        tag, size = raw[pos:pos + 4], struct.unpack("<I", raw[pos + 4:pos + 8])[0]
+        chunks[tag] = raw[pos + 8:pos + 8 + size]
+        pos += 8 + size + (size & 1)
+    tag, channels, sample_rate, _, align = struct.unpack("<HHIIH", chunks[b"fmt "][:14])
+    frames = struct.unpack("<I", chunks[b"fact"])[0] if b"fact" in chunks else None
+    audio = chunks[b"data"]
+    if tag == FORMAT_TAGS["ima_adpcm"]:
+        return sample_rate, ima_adpcm_decode(audio, channels, align, frames)
+    if tag == FORMAT_TAGS["mulaw"]:
+        return sample_rate, mulaw_decode(np.frombuffer(audio, np.uint8)).reshape(-1, channels)
+    if tag == FORMAT_TAGS["alaw"]:
+        return sample_rate, alaw_decode(np.frombuffer(audio, np.uint8)).reshape(-1, channels)
+    return sample_rate, np.frombuffer(audio, "<i2").reshape(-1, channels)
+
+# ------------------- Batch -------------------
+def encode_presets(preset_dir: str, out_dir: str, codec: str = "ima_adpcm", target="lufs", level=None,
+                   sample_rate: int = SAMPLE_RATE, layout: str = "Stereo") -> list[str]:
+    """Renders every preset in ``preset_dir`` and writes it to ``out_dir`` in ``codec``."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name in sorted(os.listdir(preset_dir)):
+        if not name.endswith(".json"):
+            continue
+        preset_path = os.path.join(preset_dir, name)
+        layers = PresetManager.load_preset(preset_path)
+        if not layers:
+            continue
+        wave = generate_final_wave(layers, target, level, buses=PresetManager.load_buses(preset_path),
+                                   sample_rate=sample_rate, layout=layout,
+                                   dynamics=PresetManager.load_dynamics(preset_path))
+        path = os.path.join(out_dir, os.path.splitext(name)[0] + ".wav")
+        write_encoded_wav(path, wave, sample_rate, codec)
+        written.append(path)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-export presets to compressed WAV")
+    parser.add_argument("preset_dir", nargs="?", default="presets")
+    parser.add_argument("out_dir", nargs="?", default="export")
+    parser.add_argument("--codec", choices=CODECS, default="ima_adpcm")
+    parser.add_argument("--target", choices=["peak", "lufs"], default="lufs")
+    parser.add_argument("--level", type=float, default=None, help="dBFS for peak, LUFS for lufs")
+    parser.add_argument("--rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--layout", choices=list(LAYOUTS), default="Stereo")
+    args = parser.parse_args()
+    for path in encode_presets(args.preset_dir, args.out_dir, args.codec, args.target, args.level, args.rate,
+                               args.layout):
+        print(f"Exported: {path}")
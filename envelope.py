@@ -0,0 +1,80 @@
+import numpy as np
+from functools import lru_cache
+
+CURVES = ["Linear", "Exponential", "Logarithmic"]
+CURVE_STEEPNESS = 5.0
+
+def _shape(x: np.ndarray, curve: str) -> np.ndarray:
+    # Exponential: RC-style, moves fast then settles. Logarithmic: the mirror image.
+    if curve == "Exponential":
+        return -np.expm1(-CURVE_STEEPNESS * x) / -np.expm1(-CURVE_STEEPNESS)
+    if curve == "Logarithmic":
+        return np.expm1(CURVE_STEEPNESS * x) / np.expm1(CURVE_STEEPNESS)
+    return x
+
+def _ramp(begin: float, end: float, count: int, curve: str) -> np.ndarray:
+    if curve == "Linear":
+        ramp = np.linspace(begin, end, count, endpoint=False)
+    else:
+        ramp = begin + (end - begin) * _shape(np.linspace(0, 1, count, endpoint=False), curve)
+    ramp.setflags(write=False)
+    return ramp
+
+def adsr_segments(length: int, adsr: dict, sample_rate: int):
+    """Sample counts (attack, decay, sustain, release) and the sustain level."""
+    attack = int(adsr.get("Attack", 0) * sample_rate / 1000)
+    decay = int(adsr.get("Decay", 0) * sample_rate / 1000)
+    release = int(adsr.get("Release", 0) * sample_rate / 1000)
+    sustain_level = adsr.get("Sustain", 100) / 100
+
+    # Ensure lengths do not exceed total
+    total = attack + decay + release
+    if total > length:
+        scale = length / total
+        attack = int(attack * scale)
+        decay = int(decay * scale)
+        release = int(release * scale)
+
+    sustain_length = max(length - (attack + decay + release), 0)
+    return attack, decay, sustain_length, release, sustain_level
+
+def envelope_end(length: int, adsr: dict, sample_rate: int) -> int:
+    """Samples until the envelope falls silent for good: the end of the decay when sustain is 0."""
+    attack, decay, sustain_length, release, sustain_level = adsr_segments(length, adsr, sample_rate)
+    if sustain_level == 0:
+        return attack + decay
+    return attack + decay + sustain_length + release
+
+@lru_cache(maxsize=128)
+def _envelope(length: int, adsr_items: tuple, sample_rate: int, curve: str):
+    attack, decay, sustain_length, release, sustain_level = adsr_segments(length, dict(adsr_items), sample_rate)
+    return [
+        (attack, _ramp(0, 1, attack, curve)),
+        (decay, _ramp(1, sustain_level, decay, curve)),
+        (sustain_length, sustain_level),
+        (release, _ramp(sustain_level, 0, release, curve)),
+    ]
+
+def apply_envelope(wave: np.ndarray, length: int, adsr: dict, sample_rate: int,
+                   start: int = 0, curve: str = "Linear") -> np.ndarray:
+    """
+    Scales ``wave`` in place by the ADSR envelope of a ``length``-sample layer,
+    where wave[0] is sample ``start``. Only the attack/decay/release ramps are
+    stored (cached per length, ADSR and rate); sustain is a single scalar multiply.
+    """
+    stop = start + len(wave)
+    pos = 0
+    for seg_len, shape in _envelope(length, tuple(sorted(adsr.items())), sample_rate, curve):
+        lo, hi = max(start, pos), min(stop, pos + seg_len)
+        if lo < hi:
+            view = wave[lo - start:hi - start]
+            if np.isscalar(shape):
+                if shape != 1:
+                    view *= shape
+            else:
+                ramp = shape[lo - pos:hi - pos]
+                view *= ramp if wave.ndim == 1 else ramp[:, None]
+        pos += seg_len
+    if pos < stop:
+        wave[max(pos, start) - start:] = 0
+    return wave
@@ -0,0 +1,104 @@
+import os
+import wave
+import argparse
+import numpy as np
+
+from synth import SAMPLE_RATE, generate_final_wave, stream_final_wave
+from preset_manager import PresetManager
+from resample import rate_fraction, resample
+from channels import LAYOUTS, channel_count, loudness_weights
+from metering import BlockMeter, normalization_gain
+
+EXPORT_RATES = [48000, 44100, 22050, 11025]
+
+def to_pcm16(block: np.ndarray) -> np.ndarray:
+    return (np.clip(block, -1, 1) * 32767).astype("<i2")
+
+def _open_wav(path: str, sample_rate: int, channels: int = 2):
+    f = wave.open(path, "wb")
+    f.setnchannels(channels)
+    f.setsampwidth(2)
+    f.setframerate(sample_rate)
+    return f
+
+def write_wav(path: str, data: np.ndarray, sample_rate: int):
+    """Writes an in-memory (n, channels) buffer as 16-bit PCM."""
+    with _open_wav(path, sample_rate, data.shape[1]) as f:
+        f.writeframes(to_pcm16(data).tobytes())
+
+def export_wav(path: str, layers: list, target="peak", level=None, buses: list = None,
+               sample_rate: int = SAMPLE_RATE, layout: str = "Stereo", dynamics=None):
+    """Streams the normalized mix of ``layers`` into a 16-bit PCM WAV file."""
+    with _open_wav(path, sample_rate, channel_count(layout)) as f:
+        for block in stream_final_wave(layers, target, level, buses=buses, sample_rate=sample_rate, layout=layout,
+                                       dynamics=dynamics):
+            f.writeframes(to_pcm16(block).tobytes())
+
+def render_variants(layers: list, rates=EXPORT_RATES, master_rate: int = None, target="peak", level=None,
+                    buses: list = None, layout: str = "Stereo", dynamics=None) -> dict[int, np.ndarray]:
+    """
+    Synthesizes the mix once at ``master_rate`` (default: the highest requested
+    rate) and derives every other rate from it by polyphase resampling. Each
+    variant is normalized after resampling, since the resampler's overshoot
+    would otherwise push a peak-normalized master past full scale.
+    """
+    master_rate = master_rate or max(rates)
+    master = generate_final_wave(layers, None, buses=buses, sample_rate=master_rate, layout=layout,
+                                 dynamics=dynamics)
+    variants = {}
+    for rate in rates:
+        up, down = rate_fraction(rate / master_rate)
+        wave = master if up == down else resample(master, up, down)
+        meter = BlockMeter(rate, wave.shape[1], loudness_weights(layout), loudness=target == "lufs")
+        meter.process(wave)
+        variants[rate] = wave * normalization_gain(meter, target, level)
+    return variants
+
+def export_variants(base_path: str, layers: list, rates=EXPORT_RATES, master_rate: int = None,
+                    target="peak", level=None, buses: list = None, layout: str = "Stereo", dynamics=None) -> list[str]:
+    """Writes one WAV per rate, named ``<base_path>_<rate>.wav``."""
+    written = []
+    for rate, data in render_variants(layers, rates, master_rate, target, level, buses, layout, dynamics).items():
+        path = f"{base_path}_{rate}.wav"
+        write_wav(path, data, rate)
+        written.append(path)
+    return written
+
+def export_presets(preset_dir: str, out_dir: str, target="lufs", level=None, rates=None,
+                   layout: str = "Stereo") -> list[str]:
+    """
+    Renders every preset file in ``preset_dir`` to ``out_dir``, leveled to the
+    same target. With ``rates``, each preset is written once per rate.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name in sorted(os.listdir(preset_dir)):
+        if not name.endswith(".json"):
+            continue
+        preset_path = os.path.join(preset_dir, name)
+        layers = PresetManager.load_preset(preset_path)
+        if not layers:
+            continue
+        base_path = os.path.join(out_dir, os.path.splitext(name)[0])
+        buses = PresetManager.load_buses(preset_path)
+        dynamics = PresetManager.load_dynamics(preset_path)
+        if rates:
+            written += export_variants(base_path, layers, rates, target=target, level=level, buses=buses,
+                                       layout=layout, dynamics=dynamics)
+        else:
+            export_wav(base_path + ".wav", layers, target, level, buses, layout=layout, dynamics=dynamics)
+            written.append(base_path + ".wav")
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-export presets to WAV")
+    parser.add_argument("preset_dir", nargs="?", default="presets")
+    parser.add_argument("out_dir", nargs="?", default="export")
+    parser.add_argument("--target", choices=["peak", "lufs"], default="lufs")
+    parser.add_argument("--level", type=float, default=None, help="dBFS for peak, LUFS for lufs")
+    parser.add_argument("--rates", type=int, nargs="+", default=None,
+                        help="write one file per sample rate, e.g. " + " ".join(map(str, EXPORT_RATES)))
+    parser.add_argument("--layout", choices=list(LAYOUTS), default="Stereo")
+    args = parser.parse_args()
+    for path in export_presets(args.preset_dir, args.out_dir, args.target, args.level, args.rates, args.layout):
+        print(f"Exported: {path}")
@@ -0,0 +1,83 @@
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
+
+FFT_SIZE = 1024
+HOP_SIZE = 256
+MEL_BANDS = 40
+FLOOR_DB = -80.0  # relative to the loudest bin
+
+@lru_cache(maxsize=8)
+def stft_window(n_fft: int) -> np.ndarray:
+    window = np.hanning(n_fft)
+    window.setflags(write=False)
+    return window
+
+def _hz_to_mel(hz):
+    return 2595 * np.log10(1 + np.asarray(hz) / 700)
+
+def _mel_to_hz(mel):
+    return 700 * (10 ** (np.asarray(mel) / 2595) - 1)
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sample_rate: int, n_fft: int = FFT_SIZE, bands: int = MEL_BANDS) -> np.ndarray:
+    """(bands, n_fft // 2 + 1) triangular filters, evenly spaced on the mel scale."""
+    edges = _mel_to_hz(np.linspace(0, _hz_to_mel(sample_rate / 2), bands + 2))
+    bins = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+    lo, center, hi = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lo) / (center - lo)
+    falling = (hi - bins) / (hi - center)
+    bank = np.maximum(0, np.minimum(rising, falling))
+    bank.setflags(write=False)
+    return bank
+
+def power_spectrogram(wave: np.ndarray, n_fft: int = FFT_SIZE, hop: int = HOP_SIZE) -> np.ndarray:
+    """(frames, n_fft // 2 + 1) power spectra of a mono signal, all frames in one batched FFT."""
+    if len(wave) < n_fft:
+        wave = np.pad(wave, (0, n_fft - len(wave)))
+    frames = sliding_window_view(wave, n_fft)[::hop] * stft_window(n_fft)
+    spectrum = np.fft.rfft(frames, axis=1)
+    return spectrum.real ** 2 + spectrum.imag ** 2
+
+def log_mel_spectrogram(wave: np.ndarray, sample_rate: int) -> np.ndarray:
+    """(frames, MEL_BANDS) mel energies in dB, clamped to FLOOR_DB below the peak."""
+    mel = power_spectrogram(wave) @ mel_filterbank(sample_rate).T
+    db = 10 * np.log10(mel + 1e-20)
+    return np.maximum(db - db.max(), FLOOR_DB)
+
+def spectral_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Mean absolute dB difference between two log-mel spectrograms; the shorter
+    one is padded with silence so a length mismatch counts against it.
+    """
+    frames = max(len(a), len(b))
+    a = np.pad(a, ((0, frames - len(a)), (0, 0)), constant_values=FLOOR_DB)
+    b = np.pad(b, ((0, frames - len(b)), (0, 0)), constant_values=FLOOR_DB)
+    return float(np.mean(np.abs(a - b)))
+
+# ------------------- Compact embedding -------------------
+DECAY_DB = 20.0  # decay time is measured from the peak down this far
+
+def embedding(wave: np.ndarray, sample_rate: int, power: np.ndarray = None) -> np.ndarray:
+    """
+    Fixed-length fingerprint of a mono sound: its average mel profile, the
+    spectral centroid (in octaves above 20 Hz), the time it takes to decay
+    DECAY_DB below its peak and its duration, scaled to comparable ranges.
+    ``power`` is the wave's power_spectrogram, if the caller already has it.
+    """
+    power = power_spectrogram(wave) if power is None else power
+    mel = 10 * np.log10(power @ mel_filterbank(sample_rate).T + 1e-20)
+    mel = np.maximum(mel - mel.max(), FLOOR_DB)
+    profile = mel.mean(axis=0) / -FLOOR_DB
+
+    bins = np.fft.rfftfreq(FFT_SIZE, 1 / sample_rate)
+    total = power.sum()
+    centroid = (power.sum(axis=0) @ bins) / total if total > 0 else 0.0
+    octaves = np.log2(max(centroid, 20) / 20) / 10
+
+    energy = mel.max(axis=1)
+    peak = int(np.argmax(energy))
+    below = np.flatnonzero(energy[peak:] < -DECAY_DB)
+    decay = (below[0] if len(below) else len(energy) - peak) * HOP_SIZE / sample_rate
+
+    return np.concatenate([profile, [octaves, decay, len(wave) / sample_rate]])
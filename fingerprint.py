@@ -0,0 +1,143 @@
+import os
+import argparse
+import numpy as np
+from scipy.spatial import cKDTree
+
+from preset_manager import PresetManager
+from features import embedding
+from synth import generate_final_wave
+
+INDEX_FILE = "fingerprints.npz"
+INDEX_RATE = 22050  # presets are rendered at this rate for fingerprinting
+DUPLICATE_DISTANCE = 0.05
+PAIR_CHUNK = 1024  # rows per distance-matrix slab in duplicates()
+
+def preset_fingerprint(path: str, sample_rate: int = INDEX_RATE):
+    """Embedding of a preset file's normalized mono mix, or None if it has no layers."""
+    layers = PresetManager.load_preset(path)
+    if not layers:
+        return None
+    for layer in layers:
+        if layer.seed is None:
+            layer.seed = 0  # identical presets must get identical fingerprints
+    wave = generate_final_wave(layers, buses=PresetManager.load_buses(path), sample_rate=sample_rate)
+    return embedding(wave.mean(axis=1), sample_rate)
+
+
+class FingerprintIndex:
+    """
+    Preset fingerprints kept on disk next to the presets. ``update`` only
+    re-renders files whose mtime changed since they were indexed; queries work
+    on the stored vectors alone and never render anything.
+    """
+    def __init__(self, preset_dir: str, index_path: str = None):
+        self.preset_dir = preset_dir
+        self.index_path = index_path or os.path.join(preset_dir, INDEX_FILE)
+        self.names = np.array([], dtype=str)
+        self.mtimes = np.array([], dtype=np.int64)
+        self.vectors = np.zeros((0, 0))
+        self._tree = None
+        if os.path.exists(self.index_path):
+            with np.load(self.index_path) as data:
+                self.names, self.mtimes, self.vectors = data["names"], data["mtimes"], data["vectors"]
+
+    def update(self) -> list[str]:
+        """Brings the index in line with the preset folder; returns the names re-rendered."""
+        known = {name: (mtime, vector) for name, mtime, vector in zip(self.names, self.mtimes, self.vectors)}
+        entries, rendered = {}, []
+        for name in sorted(os.listdir(self.preset_dir)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.preset_dir, name)
+            mtime = os.stat(path).st_mtime_ns
+            if name in known and known[name][0] == mtime:
+                entries[name] = known[name]
+                continue
+            vector = preset_fingerprint(path)
+            if vector is not None:
+                entries[name] = (mtime, vector)
+                rendered.append(name)
+
+        if rendered or len(entries) != len(known):
+            self.names = np.array(list(entries), dtype=str)
+            self.mtimes = np.array([mtime for mtime, _ in entries.values()], dtype=np.int64)
+            self.vectors = np.array([vector for _, vector in entries.values()]).reshape(len(entries), -1) \
+                if entries else np.zeros((0, self.vectors.shape[-1]))
+            self._tree = None
+            self.save()
+        return rendered
+
+    def save(self):
+        # Written beside the index and renamed over it, so readers never see half a file
+        tmp = self.index_path + ".tmp.npz"
+        np.savez(tmp, names=self.names, mtimes=self.mtimes, vectors=self.vectors)
+        os.replace(tmp, self.index_path)
+
+    @property
+    def tree(self) -> cKDTree:
+        if self._tree is None:
+            self._tree = cKDTree(self.vectors)
+        return self._tree
+
+    def similar(self, query, k: int = 5) -> list[tuple[str, float]]:
+        """
+        The ``k`` presets closest to ``query``, which is an indexed preset name
+        (excluded from its own results) or an embedding vector.
+        """
+        if len(self.names) == 0:
+            return []
+        exclude = None
+        if isinstance(query, str):
+            exclude = query
+            query = self.vectors[self._position(query)]
+        # One extra hit covers the excluded name; it may not come back (ties), so cut to k again
+        distances, idx = self.tree.query(query, k=min(k + (exclude is not None), len(self.names)))
+        results = [(str(self.names[i]), float(d)) for d, i in zip(np.atleast_1d(distances), np.atleast_1d(idx))]
+        return [r for r in results if r[0] != exclude][:k]
+
+    def duplicates(self, max_distance: float = DUPLICATE_DISTANCE) -> list[tuple[str, str, float]]:
+        """
+        Every pair of presets whose fingerprints lie within ``max_distance``,
+        closest first. All-pairs distances come from matrix products over slabs
+        of rows, which beats a KD-tree at this dimensionality.
+        """
+        if len(self.names) < 2:
+            return []
+        vectors = self.vectors
+        squares = np.einsum("ij,ij->i", vectors, vectors)
+        pairs = []
+        for lo in range(0, len(vectors), PAIR_CHUNK):
+            # Each slab is only compared with itself and the rows after it
+            d2 = squares[lo:lo + PAIR_CHUNK, None] + squares[lo:] - 2 * vectors[lo:lo + PAIR_CHUNK] @ vectors[lo:].T
+            rows, cols = np.nonzero(d2 <= max_distance ** 2)
+            upper = cols > rows
+            rows, cols = rows[upper], cols[upper]
+            distances = np.sqrt(np.maximum(d2[rows, cols], 0))
+            pairs += zip(rows + lo, cols + lo, distances)
+        pairs.sort(key=lambda p: p[2])
+        return [(str(self.names[a]), str(self.names[b]), float(d)) for a, b, d in pairs]
+
+    def _position(self, name: str) -> int:
+        matches = np.flatnonzero(self.names == name)
+        if not len(matches):
+            raise ValueError(f"{name!r} is not in the index")
+        return int(matches[0])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find similar or duplicate presets")
+    parser.add_argument("preset_dir", nargs="?", default="presets")
+    parser.add_argument("--similar", metavar="PRESET", help="preset file name, e.g. laser.json")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--duplicates", type=float, nargs="?", const=DUPLICATE_DISTANCE, default=None,
+                        metavar="DISTANCE")
+    args = parser.parse_args()
+
+    index = FingerprintIndex(args.preset_dir)
+    for name in index.update():
+        print(f"Indexed: {name}")
+    if args.similar:
+        for name, distance in index.similar(args.similar, args.k):
+            print(f"{distance:8.4f}  {name}")
+    if args.duplicates is not None:
+        for a, b, distance in index.duplicates(args.duplicates):
+            print(f"{distance:8.4f}  {a}  {b}")
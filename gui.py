@@ -1,32 +1,70 @@
 import sys
 import json
-import random
+import multiprocessing
 import numpy as np
-import sounddevice as sd
+from concurrent.futures import ProcessPoolExecutor
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QLabel, QComboBox,
     QPushButton, QFileDialog, QCheckBox
 )
 from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QKeySequence, QShortcut
 
-from layer import Layer
-from synth import generate_final_wave
+from synth import SAMPLE_RATE
+from export import export_wav
+from encoders import write_encoded_wav
+from render_cache import RenderCache, LayerCache
+from backends import BACKENDS, SynthBackend, make_backend
+from history import History
+import random_batch
+from model import ALL, LayerModel
+from analyzer import SpectrumAnalyzer
+from playback import Player
 from preset_manager import DEFAULT_PRESETS, PresetManager
 from controls.layer_selector import LayerSelector
 from controls.control_buttons import ControlButtons
+from controls.spectrum_view import SpectrumView
 from tabs.basic_tab import BasicTab
 from tabs.advanced_tab import AdvancedTab
 
-SAMPLE_RATE = 44100
+FRAME_MS = 16  # model changes are announced at most once per frame
+RANDOM_CANDIDATES = 24
+RANDOM_POLL_MS = 50
+SAVE_FORMATS = {
+    "WAV 16-bit PCM (*.wav)": "pcm16",
+    "WAV IMA-ADPCM (*.wav)": "ima_adpcm",
+    "WAV mu-law (*.wav)": "mulaw",
+    "WAV A-law (*.wav)": "alaw"
+}
 
 class SFXGenerator(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("SFX Generator")
 
-        # Layer management
-        self.layers = [Layer(name="Layer 1")]
+        # Layer management: widgets edit the model, which notifies once per frame.
+        # The layer cache hears every change set, so a preview re-renders only the
+        # layers (and buses) an edit touched
+        self.model = LayerModel(scheduler=lambda fn: QTimer.singleShot(FRAME_MS, fn))
+        self.layer_cache = LayerCache()
+        self.model.subscribe(self.layer_cache.invalidate)
+        self.model.subscribe(self._on_model_changed)
         self.current_index = 0
+        self.render_cache = RenderCache()
+        self.backend = SynthBackend(self.render_cache, self.layer_cache)
+        self.history = History()
+        self._restoring = False
+
+        # Playback feeds the analyzer every block it plays
+        self.analyzer = SpectrumAnalyzer(SAMPLE_RATE)
+        self.analyzer.start()
+        self.player = Player(SAMPLE_RATE, on_block=self.analyzer.feed)
+
+        # Random patches are drafted in a worker process, polled until ready
+        self._random_pool = None
+        self._random_job = None
+        self._random_timer = QTimer()
+        self._random_timer.timeout.connect(self._apply_random)
 
         # Playback debounce timer
         self._preview_timer = QTimer()
@@ -42,12 +80,22 @@ class SFXGenerator(QWidget):
         self._setup_layer_selector()
         self._setup_presets()
         self._setup_controls()
+        self._setup_spectrum()
+        self._setup_history()
+
+    @property
+    def layers(self):
+        return self.model.layers
+
+    @property
+    def buses(self):
+        return self.model.buses
 
     # ------------------- UI Setup -------------------
     def _setup_tabs(self):
         self.tabs = QTabWidget()
-        self.basic_tab = BasicTab(self.layers, self.current_index, self.update_wave)
-        self.advanced_tab = AdvancedTab(self.layers, self.current_index, self.update_wave)
+        self.basic_tab = BasicTab(self.model, self.current_index)
+        self.advanced_tab = AdvancedTab(self.model, self.current_index)
         self.tabs.addTab(self.basic_tab, "Basic")
         self.tabs.addTab(self.advanced_tab, "Advanced")
         self.layout.addWidget(self.tabs)
@@ -55,7 +103,7 @@ class SFXGenerator(QWidget):
     def _setup_layer_selector(self):
         layer_layout = QHBoxLayout()
         layer_label = QLabel("Select Layer:")
-        self.layer_selector = LayerSelector(self.layers, self.change_layer)
+        self.layer_selector = LayerSelector(self.model, self.change_layer)
         layer_layout.addWidget(layer_label)
         layer_layout.addWidget(self.layer_selector)
         self.layout.addLayout(layer_layout)
@@ -73,6 +121,12 @@ class SFXGenerator(QWidget):
         self.preview_checkbox.setChecked(True)
         preset_layout.addWidget(self.preview_checkbox)
 
+        self.backend_dropdown = QComboBox()
+        self.backend_dropdown.addItems(list(BACKENDS))
+        self.backend_dropdown.currentTextChanged.connect(self.set_backend)
+        preset_layout.addWidget(QLabel("Engine:"))
+        preset_layout.addWidget(self.backend_dropdown)
+
         self.load_preset_btn = QPushButton("Load Preset")
         self.load_preset_btn.clicked.connect(self.load_preset_file)
         self.save_preset_btn = QPushButton("Save Preset")
@@ -90,6 +144,36 @@ class SFXGenerator(QWidget):
         )
         self.layout.addWidget(self.controls)
 
+    def _setup_spectrum(self):
+        self.spectrum_view = SpectrumView(self.analyzer)
+        self.layout.addWidget(self.spectrum_view)
+
+    def _setup_history(self):
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Undo), self, activated=self.undo)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Redo), self, activated=self.redo)
+        self.history.record(self.layers, self.buses, self.model.dynamics)
+
+    # ------------------- Undo / Redo -------------------
+    def record_history(self):
+        if not self._restoring:
+            self.history.record(self.layers, self.buses, self.model.dynamics)
+
+    def undo(self):
+        self._restore(self.history.undo())
+
+    def redo(self):
+        self._restore(self.history.redo())
+
+    def _restore(self, state):
+        if state is None:
+            return
+        self._restoring = True
+        try:
+            self.model.replace(*state)
+            self.model.flush()
+        finally:
+            self._restoring = False
+
     # ------------------- Layer Management -------------------
     def change_layer(self, index):
         self.current_index = index
@@ -98,91 +182,100 @@ class SFXGenerator(QWidget):
         self.basic_tab.load_layer()
         self.advanced_tab.load_layer()
 
+    def _on_model_changed(self, changes):
+        if changes is ALL:
+            self._update_layer_widgets()
+        self.record_history()
+        self.update_wave()
+
     # ------------------- Wave / Playback -------------------
     def update_wave(self):
         if getattr(self, "preview_checkbox", None) and self.preview_checkbox.isChecked():
             self._preview_timer.start(100)  # debounce 100ms
 
     def _play_preview(self):
-        sd.stop()
-        wave = generate_final_wave(self.layers)
-        sd.play(wave, SAMPLE_RATE)
+        wave = self.backend.render(self.layers, self.buses, dynamics=self.model.dynamics)
+        self.player.play(wave)
 
     def play_sfx(self):
-        sd.stop()
-        wave = generate_final_wave(self.layers)
-        sd.play(wave, SAMPLE_RATE)
+        wave = self.backend.render(self.layers, self.buses, dynamics=self.model.dynamics)
+        self.player.play(wave)
+
+    def set_backend(self, name):
+        if name == "synth":
+            self.backend = SynthBackend(self.render_cache, self.layer_cache)
+        else:
+            self.backend = make_backend(name)
+        self.update_wave()
 
     def save_sfx(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Save SFX", "", "WAV Files (*.wav)")
+        path, selected = QFileDialog.getSaveFileName(self, "Save SFX", "", ";;".join(SAVE_FORMATS))
         if not path:
             return
-        from scipy.io.wavfile import write
-        wave = generate_final_wave(self.layers)
-        write(path, SAMPLE_RATE, (wave * 32767).astype(np.int16))
+        codec = SAVE_FORMATS.get(selected, "pcm16")
+        if codec == "pcm16" and isinstance(self.backend, SynthBackend):
+            export_wav(path, self.layers, buses=self.buses, dynamics=self.model.dynamics)
+        else:
+            wave = self.backend.render(self.layers, self.buses, dynamics=self.model.dynamics)
+            write_encoded_wav(path, wave, SAMPLE_RATE, codec)
+
+    def closeEvent(self, event):
+        self.player.stop()
+        self.analyzer.stop()
+        if self._random_pool is not None:
+            self._random_pool.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
 
     # ------------------- Presets -------------------
     def apply_preset(self, preset_name):
         if preset_name == "Random":
             self.random_sfx()
             return
-        self.layers = PresetManager.generate_layer_from_preset(preset_name)
         self.current_index = 0
-        self._update_layer_widgets()
-        self.update_wave()
+        self.model.replace(PresetManager.generate_layer_from_preset(preset_name))
 
     def load_preset_file(self):
         path, _ = QFileDialog.getOpenFileName(self, "Load Preset", "", "JSON Files (*.json)")
         if not path:
             return
-        self.layers = PresetManager.load_preset(path)
         self.current_index = 0
-        self._update_layer_widgets()
-        self.update_wave()
+        self.model.replace(PresetManager.load_preset(path), PresetManager.load_buses(path),
+                           PresetManager.load_dynamics(path))
 
     def save_preset_file(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save Preset", "", "JSON Files (*.json)")
         if not path:
             return
-        PresetManager.save_preset(path, self.layers)
+        PresetManager.save_preset(path, self.layers, self.buses, self.model.dynamics)
 
     # ------------------- Random SFX -------------------
     def random_sfx(self):
-        self.layers = [self._random_layer() for _ in self.layers]
-        self.current_index = 0
-        self._update_layer_widgets()
-        self.update_wave()
+        # Drafts a small batch off the GUI thread and keeps the best-scoring patch;
+        # clicks while a batch is running don't queue more
+        if self._random_job is not None:
+            return
+        if self._random_pool is None:
+            self._random_pool = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+        self._random_job = self._random_pool.submit(random_batch.generate, RANDOM_CANDIDATES, 1, len(self.layers),
+                                                    None, 1)
+        self._random_timer.start(RANDOM_POLL_MS)
 
-    def _random_layer(self):
-        layer_data = {
-            "name": f"Layer {random.randint(1,99)}",
-            "waveform": random.choice(["Sine", "Square", "Triangle", "Sawtooth", "Noise"]),
-            "freq": random.randint(100, 4000),
-            "freq_end": None,
-            "dur": random.uniform(0.05, 1.5),
-            "adsr": {
-                "Attack": random.randint(0, 50),
-                "Decay": random.randint(10, 300),
-                "Sustain": random.randint(10, 70),
-                "Release": random.randint(10, 300)
-            },
-            "lfo_freq": random.uniform(0, 15),
-            "lfo_depth": random.randint(0, 50),
-            "distortion": random.randint(0, 80),
-            "reverb": random.randint(0, 50),
-            "filter_freq": random.randint(500, 8000),
-            "volume": random.uniform(0.5, 1.0),
-            "pan": random.uniform(0, 1)
-        }
-        if layer_data["freq_end"] is None:
-            layer_data["freq_end"] = layer_data["freq"]
-        return Layer.from_dict(layer_data)
+    def _apply_random(self):
+        if not self._random_job.done():
+            return
+        self._random_timer.stop()
+        job, self._random_job = self._random_job, None
+        best = job.result()
+        if not best:
+            return
+        patch, _ = best[0]
+        self.current_index = 0
+        self.model.replace(patch, self.buses, self.model.dynamics)
 
     # ------------------- Helpers -------------------
     def _update_layer_widgets(self):
-        self.layer_selector.layers = self.layers
-        self.layer_selector.update_selector()
-        self.basic_tab.layers = self.layers
-        self.advanced_tab.layers = self.layers
-        self.basic_tab.load_layer()
-        self.advanced_tab.load_layer()
+        self.current_index = min(self.current_index, len(self.layers) - 1)
+        self.layer_selector.update_selector(self.current_index)
+        for tab in (self.basic_tab, self.advanced_tab):
+            tab.current_index = self.current_index
+            tab.load_layer()
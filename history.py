@@ -0,0 +1,116 @@
+import json
+from layer import Layer
+from bus import Bus
+from dynamics import MasterDynamics
+
+HISTORY_LIMIT = 1000
+
+def _freeze(obj, previous=None) -> tuple:
+    """
+    Immutable form of a Layer or Bus: a tuple of (field, JSON text) pairs.
+    Pairs, and the whole tuple, are taken from ``previous`` wherever they are
+    unchanged, so consecutive states share everything an edit didn't touch.
+    """
+    old = {item[0]: item for item in previous or ()}
+    items = []
+    for key, value in obj.to_dict().items():
+        text = json.dumps(value, sort_keys=True)
+        item = old.get(key)
+        items.append(item if item is not None and item[1] == text else (key, text))
+    frozen = tuple(items)
+    return previous if frozen == previous else frozen
+
+def _freeze_dynamics(dynamics, previous=None):
+    return _freeze(dynamics, previous) if dynamics is not None else None
+
+def _thaw(frozen: tuple, cls):
+    return cls.from_dict({key: json.loads(text) for key, text in frozen})
+
+def _changes(a: tuple, b: tuple):
+    # (index, field) pairs that differ between two lists of frozen objects
+    changed = set()
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x is not y:
+            changed.update((i, item[0]) for item, other in zip(x, y) if item is not other)
+    return frozenset(changed)
+
+
+class History:
+    """
+    Undo/redo over the layers, buses and master dynamics of a session. Each
+    state is a tuple of frozen layers that shares every unchanged layer, and
+    every unchanged field of a changed one, with the state before it, so an
+    edit costs about the size of what it changed. Consecutive edits of the
+    same field (a slider drag) merge into one step, but never into a state
+    reached by undo or redo. Undo restores the exact earlier parameters, so
+    renders of them come straight back out of the render cache.
+    """
+    def __init__(self, limit: int = HISTORY_LIMIT):
+        self.limit = limit
+        self._states = []  # (frozen layers, buses, dynamics, fields changed from the previous state)
+        self._pos = -1
+        self._mergeable = False  # the current state is the latest edit, not one reached by undo/redo
+
+    @property
+    def can_undo(self) -> bool:
+        return self._pos > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._pos < len(self._states) - 1
+
+    def record(self, layers: list, buses: list = (), dynamics: MasterDynamics = None) -> bool:
+        """Adds the current state as an undo step; returns False if nothing changed."""
+        if self._pos < 0:
+            self._states.append((tuple(_freeze(l) for l in layers), tuple(_freeze(b) for b in buses),
+                                 _freeze_dynamics(dynamics), None))
+            self._pos = 0
+            self._mergeable = False
+            return True
+
+        prev_layers, prev_buses, prev_dynamics, prev_changed = self._states[self._pos]
+        frozen_dynamics = _freeze_dynamics(dynamics, prev_dynamics)
+        same_shape = len(layers) == len(prev_layers) and len(buses) == len(prev_buses)
+        if same_shape:
+            frozen_layers = tuple(_freeze(l, p) for l, p in zip(layers, prev_layers))
+            frozen_buses = tuple(_freeze(b, p) for b, p in zip(buses, prev_buses))
+            changed = _changes(frozen_layers, prev_layers)
+            if not changed and frozen_buses == prev_buses and frozen_dynamics == prev_dynamics:
+                return False
+        else:
+            frozen_layers = tuple(_freeze(l) for l in layers)
+            frozen_buses = tuple(_freeze(b) for b in buses)
+            changed = None
+
+        del self._states[self._pos + 1:]
+        mergeable = self._mergeable and self._pos > 0
+        self._mergeable = True
+        if mergeable and same_shape and changed and changed == prev_changed and len(changed) == 1:
+            # Same field again: merge
+            self._states[self._pos] = (frozen_layers, frozen_buses, frozen_dynamics, changed)
+        else:
+            self._states.append((frozen_layers, frozen_buses, frozen_dynamics, changed))
+            if len(self._states) > self.limit:
+                del self._states[0]
+            self._pos = len(self._states) - 1
+        return True
+
+    def undo(self):
+        """(layers, buses, dynamics) of the previous state, or None at the start of the history."""
+        if not self.can_undo:
+            return None
+        self._pos -= 1
+        self._mergeable = False
+        return self._restore()
+
+    def redo(self):
+        if not self.can_redo:
+            return None
+        self._pos += 1
+        self._mergeable = False
+        return self._restore()
+
+    def _restore(self):
+        layers, buses, dynamics, _ = self._states[self._pos]
+        return ([_thaw(l, Layer) for l in layers], [_thaw(b, Bus) for b in buses],
+                _thaw(dynamics, MasterDynamics) if dynamics is not None else None)
@@ -7,6 +7,21 @@ class Layer:
         self.freq = 440
         self.freq_end = 440
         self.dur = 1.0  # seconds
+        self.sweep = "Linear"  # Linear, Exponential or Custom
+        self.sweep_curve = []  # [position 0-1, freq] breakpoints for Custom sweeps
+
+        # Noise (waveform "Noise")
+        self.noise_color = "White"  # White, Pink, Brown or Velvet
+        self.noise_table = False  # read from cached precomputed tables instead of generating
+
+        # Sample playback (waveform "Sample")
+        self.sample_path = ""
+        self.sample_root = 440.0  # freq at which the sample plays at its original pitch
+
+        # Granular (waveform "Granular"; grains come from the sample, or noise without one)
+        self.grain_size = 50  # ms
+        self.grain_density = 100  # grains per second
+        self.grain_jitter = 50  # %
 
         # ADSR envelope
         self.adsr = {
@@ -15,20 +30,25 @@ class Layer:
             "Sustain": 50,
             "Release": 100
         }
+        self.adsr_curve = "Linear"  # Linear, Exponential or Logarithmic
 
         # LFO / Modulation
         self.lfo_freq = 0.0
         self.lfo_depth = 0.0
         self.lfos = []  # Optional multiple LFOs for advanced synth
+        self.mod_sources = []  # [{"source": layer name, "type": FM/AM/Ring, "depth": ...}]
 
         # Effects
         self.distortion = 0
         self.reverb = 0
         self.filter_freq = 8000
         self.bitcrusher = 0  # Make sure bitcrusher is also present
+        self.sends = {}  # bus name -> send amount (%), post-fader
+        self.automation = {}  # parameter -> [position 0-1, value] breakpoints, see automation.AUTOMATABLE
 
         # Randomness
         self.randomness = 0.0  # Added to fix generate_layer_wave
+        self.seed = None  # Fixed noise seed; None draws a fresh one per render
 
         # Output
         self.volume = 1.0
@@ -42,15 +62,29 @@ class Layer:
             "freq": self.freq,
             "freq_end": self.freq_end,
             "dur": self.dur,
+            "sweep": self.sweep,
+            "sweep_curve": [list(p) for p in self.sweep_curve],
+            "noise_color": self.noise_color,
+            "noise_table": self.noise_table,
+            "sample_path": self.sample_path,
+            "sample_root": self.sample_root,
+            "grain_size": self.grain_size,
+            "grain_density": self.grain_density,
+            "grain_jitter": self.grain_jitter,
             "adsr": self.adsr.copy(),
+            "adsr_curve": self.adsr_curve,
             "lfo_freq": self.lfo_freq,
             "lfo_depth": self.lfo_depth,
             "lfos": self.lfos.copy(),
+            "mod_sources": [dict(route) for route in self.mod_sources],
             "distortion": self.distortion,
             "reverb": self.reverb,
             "filter_freq": self.filter_freq,
             "bitcrusher": self.bitcrusher,
+            "sends": dict(self.sends),
+            "automation": {name: [list(p) for p in points] for name, points in self.automation.items()},
             "randomness": self.randomness,
+            "seed": self.seed,
             "volume": self.volume,
             "pan": self.pan
         }
@@ -62,15 +96,29 @@ class Layer:
         layer.freq = data.get("freq", 440)
         layer.freq_end = data.get("freq_end", layer.freq)
         layer.dur = data.get("dur", 1.0)
+        layer.sweep = data.get("sweep", "Linear")
+        layer.sweep_curve = data.get("sweep_curve", [])
+        layer.noise_color = data.get("noise_color", "White")
+        layer.noise_table = data.get("noise_table", False)
+        layer.sample_path = data.get("sample_path", "")
+        layer.sample_root = data.get("sample_root", 440.0)
+        layer.grain_size = data.get("grain_size", 50)
+        layer.grain_density = data.get("grain_density", 100)
+        layer.grain_jitter = data.get("grain_jitter", 50)
         layer.adsr = data.get("adsr", layer.adsr.copy())
+        layer.adsr_curve = data.get("adsr_curve", "Linear")
         layer.lfo_freq = data.get("lfo_freq", 0.0)
         layer.lfo_depth = data.get("lfo_depth", 0.0)
         layer.lfos = data.get("lfos", [])
+        layer.mod_sources = data.get("mod_sources", [])
         layer.distortion = data.get("distortion", 0)
         layer.reverb = data.get("reverb", 0)
         layer.filter_freq = data.get("filter_freq", 8000)
         layer.bitcrusher = data.get("bitcrusher", 0)
+        layer.sends = data.get("sends", {})
+        layer.automation = data.get("automation", {})
         layer.randomness = data.get("randomness", 0.0)
+        layer.seed = data.get("seed", None)
         layer.volume = data.get("volume", 1.0)
         layer.pan = data.get("pan", 0.5)
         return layer
@@ -0,0 +1,71 @@
+import numpy as np
+from scipy.signal import sawtooth, square, butter, lfilter
+
+SAMPLE_RATE = 44100
+LEGACY_TAPS = [0.02, 0.04, 0.06]  # in seconds
+
+# The original single-file engine from main2.py, kept as it was so it can be
+# compared against synth.py. It reads the attributes both Layer classes have
+# (waveform, freq, dur, adsr, lfo_*, distortion, reverb, filter_freq) and
+# ignores everything else: sweeps, noise, panning, routing, buses.
+
+def apply_adsr(length, adsr, sample_rate: int = SAMPLE_RATE):
+    attack = int(sample_rate*adsr["Attack"]/1000)
+    decay = int(sample_rate*adsr["Decay"]/1000)
+    sustain_level = adsr["Sustain"]/100
+    release = int(sample_rate*adsr["Release"]/1000)
+    sustain_length = max(length-(attack+decay+release),0)
+    env = np.zeros(length)
+    if attack>0: env[:attack] = np.linspace(0,1,attack)
+    if decay>0: env[attack:attack+decay] = np.linspace(1,sustain_level,decay)
+    if sustain_length>0: env[attack+decay:attack+decay+sustain_length] = sustain_level
+    if release>0: env[-release:] = np.linspace(sustain_level,0,release)
+    return env
+
+def generate_layer_wave(layer, sample_rate: int = SAMPLE_RATE):
+    t = np.linspace(0, layer.dur, int(sample_rate*layer.dur), endpoint=False)
+    # Phase accumulation FM
+    phase = np.cumsum(2*np.pi*(layer.freq + layer.lfo_depth*np.sin(2*np.pi*layer.lfo_freq*t))/sample_rate)
+    if layer.waveform=="Sine": wave = np.sin(phase)
+    elif layer.waveform=="Square": wave = square(phase)
+    elif layer.waveform=="Triangle": wave = sawtooth(phase,0.5)
+    elif layer.waveform=="Sawtooth": wave = sawtooth(phase)
+    else: wave = np.zeros_like(t)
+
+    # Apply ADSR
+    wave *= apply_adsr(len(wave), layer.adsr, sample_rate)
+
+    # Distortion
+    if layer.distortion>0: wave = np.tanh(wave*(1+5*layer.distortion/100))
+
+    # Multi-tap Reverb
+    if layer.reverb>0:
+        reverb_wave = np.zeros_like(wave)
+        for tap in LEGACY_TAPS:
+            delay = int(sample_rate * tap)
+            if delay < len(wave):
+                temp = np.zeros_like(wave)
+                temp[delay:] = wave[:-delay]
+                reverb_wave += temp
+        reverb_wave /= len(LEGACY_TAPS)
+        wave = (1-layer.reverb/100)*wave + (layer.reverb/100)*reverb_wave
+
+    # Lowpass filter
+    if layer.filter_freq>0:
+        filter_cut = min(layer.filter_freq, sample_rate/2-1)
+        b,a = butter(2, filter_cut/(sample_rate/2), 'low')
+        wave = lfilter(b,a,wave)
+
+    # Normalize
+    if np.max(np.abs(wave))>0: wave /= np.max(np.abs(wave))
+    return wave
+
+def generate_final_wave(layers, sample_rate: int = SAMPLE_RATE):
+    """Mono mix: every layer peak-normalized, then averaged."""
+    max_len = int(sample_rate * max(layer.dur for layer in layers))
+    final_wave = np.zeros(max_len)
+    for layer in layers:
+        wave = generate_layer_wave(layer, sample_rate)
+        final_wave[:len(wave)] += wave
+    if len(layers)>0: final_wave /= len(layers)
+    return final_wave
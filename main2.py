@@ -8,9 +8,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 import random
-from scipy.signal import sawtooth, square, butter, lfilter
-
-SAMPLE_RATE = 44100
+import legacy_synth
+from legacy_synth import SAMPLE_RATE
 
 class Layer:
     def __init__(self, name="Layer 1"):
@@ -274,66 +273,14 @@ class SFXGenerator(QWidget):
 
     # ---------------- Wave Generation ----------------
     def generate_layer_wave(self, layer:Layer):
-        t = np.linspace(0, layer.dur, int(SAMPLE_RATE*layer.dur), endpoint=False)
-        # Phase accumulation FM
-        phase = np.cumsum(2*np.pi*(layer.freq + layer.lfo_depth*np.sin(2*np.pi*layer.lfo_freq*t))/SAMPLE_RATE)
-        if layer.waveform=="Sine": wave = np.sin(phase)
-        elif layer.waveform=="Square": wave = square(phase)
-        elif layer.waveform=="Triangle": wave = sawtooth(phase,0.5)
-        elif layer.waveform=="Sawtooth": wave = sawtooth(phase)
-        else: wave = np.zeros_like(t)
-
-        # Apply ADSR
-        wave *= self.apply_adsr(len(wave), layer.adsr)
-
-        # Distortion
-        if layer.distortion>0: wave = np.tanh(wave*(1+5*layer.distortion/100))
-
-        # Multi-tap Reverb
-        if layer.reverb>0:
-            taps = [0.02, 0.04, 0.06]  # in seconds
-            reverb_wave = np.zeros_like(wave)
-            for tap in taps:
-                delay = int(SAMPLE_RATE * tap)
-                if delay < len(wave):
-                    temp = np.zeros_like(wave)
-                    temp[delay:] = wave[:-delay]
-                    reverb_wave += temp
-            reverb_wave /= len(taps)
-            wave = (1-layer.reverb/100)*wave + (layer.reverb/100)*reverb_wave
-
-        # Lowpass filter
-        if layer.filter_freq>0:
-            filter_cut = min(layer.filter_freq, SAMPLE_RATE/2-1)
-            b,a = butter(2, filter_cut/(SAMPLE_RATE/2), 'low')
-            wave = lfilter(b,a,wave)
-
-        # Normalize
-        if np.max(np.abs(wave))>0: wave /= np.max(np.abs(wave))
-        return wave
+        return legacy_synth.generate_layer_wave(layer, SAMPLE_RATE)
 
     def apply_adsr(self,length,adsr):
-        attack = int(SAMPLE_RATE*adsr["Attack"]/1000)
-        decay = int(SAMPLE_RATE*adsr["Decay"]/1000)
-        sustain_level = adsr["Sustain"]/100
-        release = int(SAMPLE_RATE*adsr["Release"]/1000)
-        sustain_length = max(length-(attack+decay+release),0)
-        env = np.zeros(length)
-        if attack>0: env[:attack] = np.linspace(0,1,attack)
-        if decay>0: env[attack:attack+decay] = np.linspace(1,sustain_level,decay)
-        if sustain_length>0: env[attack+decay:attack+decay+sustain_length] = sustain_level
-        if release>0: env[-release:] = np.linspace(sustain_level,0,release)
-        return env
+        return legacy_synth.apply_adsr(length, adsr, SAMPLE_RATE)
 
     # ---------------- Final Wave ----------------
     def generate_final_wave(self):
-        max_len = int(SAMPLE_RATE * max(layer.dur for layer in self.layers))
-        final_wave = np.zeros(max_len)
-        for layer in self.layers:
-            wave = self.generate_layer_wave(layer)
-            final_wave[:len(wave)] += wave
-        if len(self.layers)>0: final_wave /= len(self.layers)
-        return final_wave
+        return legacy_synth.generate_final_wave(self.layers, SAMPLE_RATE)
 
     # ---------------- Playback / Save ----------------
     def play_sfx(self):
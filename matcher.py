@@ -0,0 +1,141 @@
+import os
+import argparse
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from layer import Layer
+from preset_manager import PresetManager
+from sample import open_sample, to_float_mono
+from resample import rate_fraction, resample
+from features import log_mel_spectrogram, spectral_distance
+from synth import SAMPLE_RATE, generate_layer_wave
+
+# Searched parameters: (name, low, high, log scale); ADSR stages are in layer.adsr
+PARAMS = [
+    ("freq", 20, 8000, True),
+    ("freq_end", 20, 8000, True),
+    ("Attack", 0, 500, False),
+    ("Decay", 0, 1000, False),
+    ("Sustain", 0, 100, False),
+    ("Release", 0, 1000, False),
+    ("filter_freq", 100, 16000, True),
+    ("distortion", 0, 100, False),
+    ("lfo_freq", 0, 30, False),
+    ("lfo_depth", 0, 500, False),
+]
+FREQUENCIES = {"freq", "freq_end", "filter_freq"}  # capped below the search rate's Nyquist
+WAVEFORMS = ["Sine", "Square", "Triangle", "Sawtooth", "Noise"]
+DIMENSIONS = len(PARAMS) + 1  # the last gene picks the waveform
+
+def decode(x: np.ndarray, dur: float, sample_rate: int = SAMPLE_RATE) -> Layer:
+    """
+    Maps a point in the unit cube to a layer of duration ``dur``. Frequencies
+    stop just below Nyquist at ``sample_rate``, where the filter clamps them,
+    so a match sounds the same when rendered at a higher rate.
+    """
+    x = np.clip(x, 0, 1)
+    layer = Layer("Match")
+    layer.dur = dur
+    layer.seed = 0  # candidates are scored, and saved, with fixed noise
+    for (name, low, high, log), v in zip(PARAMS, x):
+        if name in FREQUENCIES:
+            high = min(high, sample_rate / 2 - 1)
+        value = float(low * (high / low) ** v if log else low + (high - low) * v)
+        if name in layer.adsr:
+            layer.adsr[name] = value
+        else:
+            setattr(layer, name, value)
+    layer.waveform = WAVEFORMS[min(int(x[-1] * len(WAVEFORMS)), len(WAVEFORMS) - 1)]
+    return layer
+
+# ------------------- Reference features -------------------
+def load_reference(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    file_rate, frames = open_sample(path)
+    up, down = rate_fraction(sample_rate / file_rate)
+    return resample(to_float_mono(frames), up, down)
+
+@lru_cache(maxsize=16)
+def _reference_features(path: str, mtime: int, sample_rate: int):
+    wave = load_reference(path, sample_rate)
+    features = log_mel_spectrogram(wave, sample_rate)
+    features.setflags(write=False)
+    return features, len(wave) / sample_rate
+
+def reference_features(path: str, sample_rate: int = SAMPLE_RATE):
+    """(log-mel spectrogram, duration in s) of a WAV file, cached until the file changes."""
+    path = os.path.abspath(path)
+    return _reference_features(path, os.stat(path).st_mtime_ns, sample_rate)
+
+# ------------------- Candidate scoring (runs in the worker processes) -------------------
+_target = None
+
+def _init_worker(features: np.ndarray, dur: float, sample_rate: int):
+    # Sent once per worker rather than with every candidate
+    global _target
+    _target = (features, dur, sample_rate)
+
+def _score(x: np.ndarray) -> float:
+    features, dur, sample_rate = _target
+    wave = generate_layer_wave(decode(x, dur, sample_rate), seed=0, sample_rate=sample_rate).sum(axis=1)
+    if not np.any(wave):
+        return np.inf
+    return spectral_distance(log_mel_spectrogram(wave, sample_rate), features)
+
+# ------------------- Search -------------------
+def match(reference_path: str, generations: int = 30, population: int = 32, elite: int = 8,
+          workers: int = None, seed=None, sample_rate: int = SAMPLE_RATE, callback=None):
+    """
+    Evolves a layer towards the reference WAV and returns (layer, distance).
+    Each generation is sampled around a weighted mean of the previous
+    generation's elite, with a per-parameter spread that adapts to the elite's
+    own spread (cross-entropy / CMA-style without the covariance), and is
+    scored in parallel across a process pool. ``callback(generation, best)``
+    is called after every generation.
+    """
+    features, dur = reference_features(reference_path, sample_rate)
+    rng = np.random.default_rng(seed)
+    weights = np.log(elite + 0.5) - np.log(np.arange(1, elite + 1))
+    weights /= weights.sum()
+    mean = np.full(DIMENSIONS, 0.5)
+    spread = np.full(DIMENSIONS, 0.3)
+    best_x, best_score = mean, np.inf
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(population // (4 * workers), 1)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(features, dur, sample_rate)) as pool:
+        for generation in range(generations):
+            candidates = np.clip(mean + spread * rng.standard_normal((population, DIMENSIONS)), 0, 1)
+            candidates[0] = best_x  # the best so far always survives
+            scores = np.fromiter(pool.map(_score, candidates, chunksize=chunksize), float, population)
+
+            order = np.argsort(scores)
+            if scores[order[0]] < best_score:
+                best_x, best_score = candidates[order[0]].copy(), scores[order[0]]
+            top = candidates[order[:elite]]
+            mean = weights @ top
+            spread = np.maximum(np.sqrt(weights @ (top - mean) ** 2), 0.02)
+            if callback:
+                callback(generation, best_score)
+
+    return decode(best_x, dur, sample_rate), best_score
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search for a preset that sounds like a reference WAV")
+    parser.add_argument("reference")
+    parser.add_argument("output", help="preset file to write")
+    parser.add_argument("--generations", type=int, default=30)
+    parser.add_argument("--population", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rate", type=int, default=22050, help="render rate while searching; frequencies stay below its Nyquist")
+    args = parser.parse_args()
+
+    def report(generation, best):
+        print(f"Generation {generation + 1}/{args.generations}: distance {best:.2f} dB")
+
+    layer, score = match(args.reference, args.generations, args.population, workers=args.workers,
+                         seed=args.seed, sample_rate=args.rate, callback=report)
+    PresetManager.save_preset(args.output, [layer])
+    print(f"Saved: {args.output} ({layer.waveform}, distance {score:.2f} dB)")
@@ -0,0 +1,156 @@
+import numpy as np
+from functools import lru_cache
+from scipy.signal import sosfilt
+
+# ITU-R BS.1770 gating constants
+ABSOLUTE_GATE = -70.0   # LUFS
+RELATIVE_GATE = -10.0   # LU below the absolute-gated loudness
+GATE_BLOCK = 0.4        # seconds per gating block
+GATE_STEP = 0.1         # seconds between gating blocks (75% overlap)
+
+
+def db_to_gain(db: float) -> float:
+    return 10 ** (db / 20)
+
+def gain_to_db(gain: float) -> float:
+    return 20 * np.log10(gain) if gain > 0 else -np.inf
+
+def _loudness(mean_square: float) -> float:
+    return -0.691 + 10 * np.log10(mean_square) if mean_square > 0 else -np.inf
+
+@lru_cache(maxsize=None)
+def k_weighting_sos(sample_rate: int) -> np.ndarray:
+    """
+    K-weighting pre-filter (high shelf + RLB high-pass) as second-order sections.
+    The BS.1770 coefficients are specified at 48 kHz; they are re-derived from
+    their analog prototypes so any render rate gets the same response.
+    """
+    # Stage 1: high shelf modelling the acoustic effect of the head
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    # Stage 2: RLB high-pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    return np.array([shelf, highpass])
+
+
+class BlockMeter:
+    """
+    Accumulates peak, RMS and BS.1770 integrated loudness over consecutive blocks,
+    so a mix can be measured without ever holding it in memory as a whole.
+    """
+    def __init__(self, sample_rate: int, channels: int = 2, channel_weights=None, loudness: bool = True):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.channel_weights = np.ones(channels) if channel_weights is None else np.asarray(channel_weights, dtype=float)
+        self.loudness = loudness
+
+        self.count = 0
+        self.peak = 0.0
+        self._sum_squares = 0.0
+
+        # K-weighted energy, summed per 100 ms hop for gating
+        self._sos = k_weighting_sos(sample_rate)
+        self._zi = np.zeros((self._sos.shape[0], 2, channels))
+        self._hop = int(round(GATE_STEP * sample_rate))
+        self._hop_fill = 0
+        self._hop_energy = 0.0
+        self._hops = []
+        self._weighted_total = 0.0
+
+    def process(self, block: np.ndarray):
+        block = np.asarray(block, dtype=float)
+        if block.ndim == 1:
+            block = block[:, None]
+        if len(block) == 0:
+            return
+        self.count += len(block)
+        self.peak = max(self.peak, float(np.max(np.abs(block))))
+        self._sum_squares += float(np.einsum("ij,ij->", block, block))
+        if self.loudness:
+            self._process_loudness(block)
+
+    def _process_loudness(self, block: np.ndarray):
+        weighted, self._zi = sosfilt(self._sos, block, axis=0, zi=self._zi)
+        energy = np.square(weighted) @ self.channel_weights
+        self._weighted_total += float(energy.sum())
+
+        # Split the block on hop boundaries; at most a couple per block
+        pos = 0
+        while pos < len(energy):
+            take = min(self._hop - self._hop_fill, len(energy) - pos)
+            self._hop_energy += float(energy[pos:pos + take].sum())
+            self._hop_fill += take
+            pos += take
+            if self._hop_fill == self._hop:
+                self._hops.append(self._hop_energy)
+                self._hop_fill = 0
+                self._hop_energy = 0.0
+
+    # ------------------- Readings -------------------
+    @property
+    def rms(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return float(np.sqrt(self._sum_squares / (self.count * self.channels)))
+
+    @property
+    def peak_db(self) -> float:
+        return gain_to_db(self.peak)
+
+    @property
+    def rms_db(self) -> float:
+        return gain_to_db(self.rms)
+
+    @property
+    def integrated_loudness(self) -> float:
+        """Gated integrated loudness in LUFS (-inf for silence)."""
+        if not self.loudness:
+            raise RuntimeError("BlockMeter was created with loudness=False")
+        if self.count == 0:
+            return -np.inf
+
+        per_block = int(round(GATE_BLOCK / GATE_STEP))
+        if len(self._hops) < per_block:
+            # Shorter than one gating block (most hits and zaps): use the ungated mean
+            return _loudness(self._weighted_total / self.count)
+
+        z = np.convolve(self._hops, np.ones(per_block), "valid") / (per_block * self._hop)
+        with np.errstate(divide="ignore"):
+            levels = -0.691 + 10 * np.log10(z)
+        z, levels = z[levels > ABSOLUTE_GATE], levels[levels > ABSOLUTE_GATE]
+        if len(z) == 0:
+            return -np.inf
+        threshold = _loudness(z.mean()) + RELATIVE_GATE
+        return _loudness(z[levels > threshold].mean())
+
+
+def normalization_gain(meter: BlockMeter, target: str = "peak", level: float = None, ceiling: float = -1.0) -> float:
+    """
+    Gain that brings a metered signal to ``level``.
+    target="peak": level in dBFS (default 0, i.e. the old full-scale normalize)
+    target="lufs": level in LUFS (default -16), limited so the peak stays under ``ceiling`` dBFS
+    target=None: no normalization
+    """
+    if target is None:
+        return 1.0
+    if target == "peak":
+        level = 0.0 if level is None else level
+        return db_to_gain(level) / (meter.peak + 1e-12) if meter.peak > 0 else 1.0
+    if target == "lufs":
+        level = -16.0 if level is None else level
+        loudness = meter.integrated_loudness
+        if not np.isfinite(loudness):
+            return 1.0
+        gain = db_to_gain(level - loudness)
+        return min(gain, db_to_gain(ceiling) / meter.peak)
+    raise ValueError(f"Unknown normalization target: {target!r}")
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from layer import Layer
+
+ALL = None  # notification for a structural change: anything may have changed
+
+class LayerModel:
+    """
+    The session's layers, buses and master dynamics, edited only through ``set`` and the
+    structural methods. Edits are collected rather than announced one by one:
+    listeners get a single notification per transaction, or per ``scheduler``
+    tick (one GUI frame) outside transactions, holding the set of
+    (layer index, field) pairs that actually changed, or ALL after a
+    structural change. Writing a value a field already has is not a change.
+    """
+    def __init__(self, layers: list = None, buses: list = None, scheduler=None, dynamics=None):
+        self.layers = layers if layers is not None else [Layer(name="Layer 1")]
+        self.buses = buses if buses is not None else []
+        self.dynamics = dynamics  # MasterDynamics, or None for none
+        self.scheduler = scheduler  # scheduler(fn) runs fn later, e.g. on the next frame
+        self._listeners = []
+        self._pending = set()
+        self._depth = 0
+        self._flush_requested = False
+
+    def subscribe(self, listener):
+        """``listener(changes)`` is called with a frozenset of (index, field) pairs, or ALL."""
+        self._listeners.append(listener)
+
+    # ------------------- Edits -------------------
+    def get(self, index: int, field: str):
+        layer = self.layers[index]
+        if "." in field:
+            attr, key = field.split(".", 1)
+            return getattr(layer, attr).get(key)
+        return getattr(layer, field)
+
+    def set(self, index: int, field: str, value):
+        """Sets a layer field; "adsr.Attack" style names reach into dict fields."""
+        if self.get(index, field) == value:
+            return
+        layer = self.layers[index]
+        if "." in field:
+            attr, key = field.split(".", 1)
+            getattr(layer, attr)[key] = value
+        else:
+            setattr(layer, field, value)
+        self._changed((index, field))
+
+    def add_layer(self, layer: Layer):
+        self.layers.append(layer)
+        self._changed(ALL)
+
+    def remove_layer(self, index: int):
+        self.layers.pop(index)
+        self._changed(ALL)
+
+    def replace(self, layers: list, buses: list = None, dynamics=None):
+        """Swaps in a whole new session state (preset, random patch, undo)."""
+        self.layers[:] = layers
+        self.buses[:] = buses if buses is not None else []
+        self.dynamics = dynamics
+        self._changed(ALL)
+
+    def set_layer(self, index: int, layer: Layer):
+        self.layers[index] = layer
+        self._changed(ALL)
+
+    @contextmanager
+    def transaction(self):
+        """Edits inside the block are announced together, never split across notifications."""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._schedule()
+
+    # ------------------- Notification -------------------
+    def _changed(self, change):
+        if change is ALL:
+            self._pending = ALL
+        elif self._pending is not ALL:
+            self._pending.add(change)
+        if not self._depth:
+            self._schedule()
+
+    def _schedule(self):
+        if self.scheduler is None:
+            self.flush()
+        elif not self._flush_requested:
+            self._flush_requested = True
+            self.scheduler(self.flush)
+
+    def flush(self):
+        """Notifies listeners of the pending changes now, if there are any."""
+        self._flush_requested = False
+        if self._pending is not ALL and not self._pending:
+            return
+        changes = ALL if self._pending is ALL else frozenset(self._pending)
+        self._pending = set()
+        for listener in self._listeners:
+            listener(changes)
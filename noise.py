@@ -0,0 +1,136 @@
+import numpy as np
+from functools import lru_cache
+from scipy.signal import lfilter
+
+NOISE_COLORS = ["White", "Pink", "Brown", "Velvet"]
+NOISE_RMS = 0.3  # colored noise is scaled to this RMS, which keeps peaks near full scale
+TABLE_SIZE = 2**18  # samples per precomputed table (about 6 s at 44.1 kHz)
+TABLE_COUNT = 16  # tables per color; a seed picks one and a start offset
+VELVET_DENSITY = 2000  # impulses per second
+BROWN_CORNER = 20.0  # Hz; the brown integrator leaks below this so it can't drift
+
+def white_noise(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Uniform float32 noise in [-1, 1)."""
+    wave = rng.random(n, dtype=np.float32)
+    wave *= 2
+    wave -= 1
+    return wave
+
+@lru_cache(maxsize=16)
+def shaping_filter(color: str, sample_rate: int):
+    """(b, a, gain) turning white_noise into ``color`` noise at NOISE_RMS."""
+    if color == "Pink":
+        # -3 dB/octave from three pole/zero pairs (J. O. Smith's approximation)
+        b = np.array([0.049922035, -0.095993537, 0.050612699, -0.004408786])
+        a = np.array([1, -2.494956002, 2.017265875, -0.522189400])
+    elif color == "Brown":
+        # -6 dB/octave: a leaky integrator
+        b = np.array([1.0])
+        a = np.array([1.0, -np.exp(-2 * np.pi * BROWN_CORNER / sample_rate)])
+    else:
+        raise ValueError(f"No shaping filter for {color!r} noise")
+    impulse = np.zeros(sample_rate)
+    impulse[0] = 1
+    energy = np.sum(lfilter(b, a, impulse) ** 2)
+    return b, a, NOISE_RMS / np.sqrt(energy / 3)  # white_noise has variance 1/3
+
+@lru_cache(maxsize=32)
+def noise_table(color: str, index: int, sample_rate: int) -> np.ndarray:
+    """
+    TABLE_SIZE samples of ``color`` noise, the same for every call with the same
+    index. Colors are shaped in the frequency domain, so each table loops
+    without a seam.
+    """
+    rng = np.random.default_rng([index, NOISE_COLORS.index(color)])
+    if color == "White":
+        table = white_noise(rng, TABLE_SIZE)
+    elif color == "Velvet":
+        table = VelvetNoise(sample_rate, rng).render(TABLE_SIZE)
+    else:
+        spectrum = rng.standard_normal(TABLE_SIZE // 2 + 1) + 1j * rng.standard_normal(TABLE_SIZE // 2 + 1)
+        freqs = np.maximum(np.fft.rfftfreq(TABLE_SIZE, 1 / sample_rate), BROWN_CORNER)
+        spectrum *= freqs ** (-0.5 if color == "Pink" else -1.0)
+        spectrum[0] = 0
+        table = np.fft.irfft(spectrum, TABLE_SIZE)
+        table *= NOISE_RMS / np.sqrt(np.mean(table ** 2))
+        table = table.astype(np.float32)
+    table.setflags(write=False)
+    return table
+
+
+class VelvetNoise:
+    """
+    Sparse noise: one +1/-1 impulse at a random spot in every 1/VELVET_DENSITY s
+    period. Impulses are drawn period by period, so blocks of any size give
+    the same sequence.
+    """
+    def __init__(self, sample_rate: int, rng: np.random.Generator = None):
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.spacing = sample_rate / VELVET_DENSITY
+        self.pos = 0
+        self._drawn = 0  # periods drawn so far
+        self._pending = np.zeros((0, 2))  # (position, sign) of drawn impulses not yet output
+
+    def render(self, n: int) -> np.ndarray:
+        start, stop = self.pos, self.pos + n
+        self.pos = stop
+        periods = int(np.ceil(stop / self.spacing))
+        if periods > self._drawn:
+            draws = self.rng.random((periods - self._drawn, 2))
+            positions = (np.arange(self._drawn, periods) + draws[:, 0]) * self.spacing
+            signs = np.where(draws[:, 1] < 0.5, -1.0, 1.0)
+            self._pending = np.concatenate([self._pending, np.column_stack([positions.astype(int), signs])])
+            self._drawn = periods
+
+        wave = np.zeros(n, dtype=np.float32)
+        due = self._pending[:, 0] < stop
+        hits = self._pending[due]
+        wave[hits[:, 0].astype(int) - start] = hits[:, 1]
+        self._pending = self._pending[~due]
+        return wave
+
+
+class NoiseSource:
+    """
+    Seeded ``color`` noise as float32 blocks. White and velvet come straight
+    from the generator, pink and brown through a shaping filter whose state
+    carries across blocks. With ``table`` set, blocks are instead read from a
+    cached noise_table (picked and entered at random), which costs only a copy.
+    """
+    def __init__(self, color: str = "White", sample_rate: int = 44100, rng: np.random.Generator = None,
+                 table: bool = False):
+        if color not in NOISE_COLORS:
+            raise ValueError(f"Unknown noise color {color!r}")
+        self.color = color
+        self.rng = np.random.default_rng() if rng is None else rng
+        self._table = None
+        if table:
+            self._table = noise_table(color, int(self.rng.integers(TABLE_COUNT)), sample_rate)
+            self._pos = int(self.rng.integers(TABLE_SIZE))
+        elif color == "Velvet":
+            self._velvet = VelvetNoise(sample_rate, self.rng)
+        elif color != "White":
+            self._b, self._a, self._gain = shaping_filter(color, sample_rate)
+            self._zi = np.zeros(len(self._a) - 1)
+
+    def render(self, n: int) -> np.ndarray:
+        if self._table is not None:
+            return self._read_table(n)
+        if self.color == "White":
+            return white_noise(self.rng, n)
+        if self.color == "Velvet":
+            return self._velvet.render(n)
+        wave, self._zi = lfilter(self._b, self._a, white_noise(self.rng, n), zi=self._zi)
+        wave *= self._gain
+        return wave.astype(np.float32)
+
+    def _read_table(self, n: int) -> np.ndarray:
+        # Wraps around the end of the table
+        wave = np.empty(n, dtype=np.float32)
+        done = 0
+        while done < n:
+            count = min(n - done, TABLE_SIZE - self._pos)
+            wave[done:done + count] = self._table[self._pos:self._pos + count]
+            self._pos = (self._pos + count) % TABLE_SIZE
+            done += count
+        return wave
@@ -0,0 +1,46 @@
+import numpy as np
+import sounddevice as sd
+
+from synth import SAMPLE_RATE
+
+PLAYBACK_BLOCK = 1024
+
+class Player:
+    """
+    Plays buffers through a sounddevice output stream. Every block handed to
+    the sound card is also passed to ``on_block`` (e.g. SpectrumAnalyzer.feed)
+    from the audio callback, so it must return immediately.
+    """
+    def __init__(self, sample_rate: int = SAMPLE_RATE, on_block=None, block_size: int = PLAYBACK_BLOCK):
+        self.sample_rate = sample_rate
+        self.on_block = on_block
+        self.block_size = block_size
+        self._stream = None
+        self._wave = None
+        self._pos = 0
+
+    def play(self, wave: np.ndarray):
+        self.stop()
+        self._wave = np.ascontiguousarray(wave, dtype=np.float32)
+        self._pos = 0
+        self._stream = sd.OutputStream(samplerate=self.sample_rate, channels=self._wave.shape[1],
+                                       blocksize=self.block_size, dtype="float32", callback=self._callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _callback(self, outdata, frames, time, status):
+        # Blocks are views of the player's own copy of the buffer, so nothing is copied here
+        chunk = self._wave[self._pos:self._pos + frames]
+        n = len(chunk)
+        outdata[:n] = chunk
+        outdata[n:] = 0
+        self._pos += n
+        if n and self.on_block is not None:
+            self.on_block(chunk)
+        if n < frames:
+            raise sd.CallbackStop
@@ -1,5 +1,8 @@
 import json
 from layer import Layer
+from bus import Bus
+from routing import render_order
+from dynamics import MasterDynamics
 
 DEFAULT_PRESETS = {
     "Explosion": [
@@ -27,11 +30,31 @@ class PresetManager:
     def load_preset(path: str):
         with open(path, "r") as f:
             data = json.load(f)
-        return [Layer.from_dict(d) for d in data.get("layers", [])]
+        layers = [Layer.from_dict(d) for d in data.get("layers", [])]
+        render_order(layers)  # reject unknown sources and cycles up front
+        return layers
+
+    @staticmethod
+    def load_buses(path: str):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return [Bus.from_dict(d) for d in data.get("buses", [])]
+
+    @staticmethod
+    def load_dynamics(path: str):
+        """The preset's master dynamics, or None if it has none."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        return MasterDynamics.from_dict(data["dynamics"]) if "dynamics" in data else None
 
     @staticmethod
-    def save_preset(path: str, layers: list):
+    def save_preset(path: str, layers: list, buses: list = None, dynamics: MasterDynamics = None):
+        render_order(layers)
         data = {"layers": [layer.to_dict() for layer in layers]}
+        if buses:
+            data["buses"] = [bus.to_dict() for bus in buses]
+        if dynamics is not None:
+            data["dynamics"] = dynamics.to_dict()
         with open(path, "w") as f:
             json.dump(data, f, indent=4)
 
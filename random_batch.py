@@ -0,0 +1,143 @@
+import os
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from layer import Layer
+from preset_manager import PresetManager
+from features import power_spectrogram, embedding
+from fingerprint import INDEX_RATE, DUPLICATE_DISTANCE, FingerprintIndex
+from synth import generate_final_wave
+from metering import gain_to_db
+
+DRAFT_RATE = INDEX_RATE  # drafts are mono at the fingerprint rate, so library distances are comparable
+WAVEFORMS = ["Sine", "Square", "Triangle", "Sawtooth", "Noise"]
+
+# Rejection thresholds
+SILENCE_DB = -50.0  # un-normalized RMS below this is treated as silent
+MIN_CREST_DB = 4.0  # below this the result is a flat, clipped-sounding block
+MAX_FLATNESS = 0.5  # above this the spectrum is close to plain white noise
+
+# Survivors rank by how close they come to these
+TARGET_CREST_DB = 12.0
+TARGET_FLATNESS = 0.05
+
+def random_layer(rng: np.random.Generator, name: str = "Layer 1") -> Layer:
+    """A layer with every parameter drawn uniformly from its useful range."""
+    freq = int(rng.integers(100, 4000))
+    return Layer.from_dict({
+        "name": name,
+        "waveform": str(rng.choice(WAVEFORMS)),
+        "freq": freq,
+        "freq_end": freq,
+        "dur": float(rng.uniform(0.05, 1.5)),
+        "adsr": {
+            "Attack": int(rng.integers(0, 50)),
+            "Decay": int(rng.integers(10, 300)),
+            "Sustain": int(rng.integers(10, 70)),
+            "Release": int(rng.integers(10, 300))
+        },
+        "lfo_freq": float(rng.uniform(0, 15)),
+        "lfo_depth": int(rng.integers(0, 50)),
+        "distortion": int(rng.integers(0, 80)),
+        "reverb": int(rng.integers(0, 50)),
+        "filter_freq": int(rng.integers(500, 8000)),
+        "volume": float(rng.uniform(0.5, 1.0)),
+        "pan": float(rng.uniform(0, 1)),
+        "seed": int(rng.integers(2**31))  # fixed, so the kept patch sounds like its draft
+    })
+
+def random_patch(rng: np.random.Generator, layers: int = 1) -> list[Layer]:
+    return [random_layer(rng, f"Layer {i + 1}") for i in range(layers)]
+
+# ------------------- Draft scoring -------------------
+def draft_metrics(layer_dicts: list[dict]):
+    """
+    Renders a patch in draft quality (mono, DRAFT_RATE) and returns
+    (rms dB, crest dB, spectral flatness, embedding). Runs in the workers.
+    """
+    layers = [Layer.from_dict(d) for d in layer_dicts]
+    wave = generate_final_wave(layers, target=None, sample_rate=DRAFT_RATE, layout="Mono")[:, 0]
+    peak = np.max(np.abs(wave))
+    rms = np.sqrt(np.mean(wave ** 2))
+    if not np.isfinite(peak) or rms == 0:
+        return -np.inf, 0.0, 1.0, None
+    power = power_spectrogram(wave)
+    spectrum = power.mean(axis=0) + 1e-20
+    flatness = float(np.exp(np.mean(np.log(spectrum))) / np.mean(spectrum))
+    return gain_to_db(rms), gain_to_db(peak / rms), flatness, embedding(wave, DRAFT_RATE, power)
+
+def quality(rms_db: np.ndarray, crest_db: np.ndarray, flatness: np.ndarray) -> np.ndarray:
+    """Higher is better; -inf for rejected candidates (silent, clipped or plain noise)."""
+    score = -np.abs(crest_db - TARGET_CREST_DB) / TARGET_CREST_DB - np.abs(np.log10(flatness / TARGET_FLATNESS)) / 2
+    rejected = (rms_db < SILENCE_DB) | (crest_db < MIN_CREST_DB) | (flatness > MAX_FLATNESS)
+    return np.where(rejected, -np.inf, score)
+
+def pick_diverse(scores: np.ndarray, vectors: np.ndarray, keep: int, max_distance: float = DUPLICATE_DISTANCE,
+                 existing: np.ndarray = None) -> list[int]:
+    """
+    Greedily takes the best-scoring candidates, skipping any within
+    ``max_distance`` of one already taken or of an ``existing`` library vector.
+    """
+    novel = np.ones(len(scores), dtype=bool)
+    if existing is not None and len(existing):
+        # All candidates against the whole library in one matmul: |a - b|^2 = |a|^2 + |b|^2 - 2ab
+        d2 = (vectors ** 2).sum(axis=1)[:, None] + (existing ** 2).sum(axis=1) - 2 * vectors @ existing.T
+        novel = d2.min(axis=1) > max_distance ** 2
+    picked = []
+    for i in np.argsort(-scores):
+        if len(picked) == keep or not np.isfinite(scores[i]):
+            break
+        if not novel[i]:
+            continue
+        if picked and np.min(np.linalg.norm(vectors[picked] - vectors[i], axis=1)) <= max_distance:
+            continue
+        picked.append(int(i))
+    return picked
+
+def generate(count: int = 300, keep: int = 10, layers: int = 1, seed=None, workers: int = None,
+             existing: np.ndarray = None) -> list[tuple[list[Layer], float]]:
+    """
+    Samples ``count`` random patches, drafts and scores them in parallel and
+    returns the ``keep`` best as (layers, score), best first, none of them
+    near-duplicates of each other or of ``existing`` fingerprint vectors.
+    With workers=1 everything runs in this process.
+    """
+    rng = np.random.default_rng(seed)
+    patches = [random_patch(rng, layers) for _ in range(count)]
+    payloads = [[layer.to_dict() for layer in patch] for patch in patches]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(draft_metrics, payloads))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(draft_metrics, payloads, chunksize=max(count // (4 * workers), 1)))
+
+    rms_db, crest_db, flatness = (np.array([r[i] for r in results], dtype=float) for i in range(3))
+    scores = quality(rms_db, crest_db, flatness)
+    size = next((len(r[3]) for r in results if r[3] is not None), 0)
+    vectors = np.array([r[3] if r[3] is not None else np.zeros(size) for r in results])  # rejected anyway
+    return [(patches[i], float(scores[i])) for i in pick_diverse(scores, vectors, keep, existing=existing)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate random presets and keep only the usable, distinct ones")
+    parser.add_argument("out_dir")
+    parser.add_argument("--count", type=int, default=300, help="candidates to draft")
+    parser.add_argument("--keep", type=int, default=10)
+    parser.add_argument("--layers", type=int, default=1, help="layers per patch")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--library", default=None, help="preset folder whose sounds should not be duplicated")
+    args = parser.parse_args()
+
+    existing = None
+    if args.library:
+        index = FingerprintIndex(args.library)
+        index.update()
+        existing = index.vectors
+    os.makedirs(args.out_dir, exist_ok=True)
+    for n, (patch, score) in enumerate(generate(args.count, args.keep, args.layers, args.seed, args.workers,
+                                                existing), 1):
+        path = os.path.join(args.out_dir, f"random_{n:03d}.json")
+        PresetManager.save_preset(path, patch)
+        print(f"Saved: {path} (score {score:.2f})")
@@ -0,0 +1,247 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+from synth import (ENGINE_VERSION, SAMPLE_RATE, BLOCK_SIZE, BusStream, generate_layer_wave, generate_final_wave,
+                   layer_seeds, mix_length, needed_layers, check_sends, render_layer_part)
+from routing import resolve_routes, render_order
+from metering import BlockMeter, normalization_gain
+from channels import channel_count, loudness_weights
+from dynamics import DynamicsStream
+from model import ALL
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sfx_generator", "renders")
+CACHE_BYTES = 512 * 2**20
+LAYER_CACHE_BYTES = 256 * 2**20
+
+def uses_rng(layer) -> bool:
+    """Whether the layer's output depends on its seed."""
+    return layer.waveform in ("Noise", "Granular") or bool(layer.randomness)
+
+def _layer_state(layer, seed) -> dict:
+    state = layer.to_dict()
+    state["seed"] = seed if uses_rng(layer) else None
+    if layer.sample_path and os.path.exists(layer.sample_path):
+        state["sample_mtime"] = os.stat(layer.sample_path).st_mtime_ns
+    return state
+
+def render_key(kind: str, payload, sample_rate: int) -> str:
+    """Content hash of everything a render depends on, including the engine version."""
+    blob = json.dumps({"kind": kind, "engine": ENGINE_VERSION, "rate": sample_rate, "payload": payload},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Rendered buffers as .npy files named by their render_key, shared by every
+    process that points at the same directory. Hits are memory-mapped
+    read-only rather than read; writers save to a temporary file and rename it
+    into place, so readers only ever see complete files. File mtimes track
+    recency, and the least recently used files go once ``max_bytes`` is passed.
+    Renders that depend on fresh randomness (no seed) are never cached.
+    """
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            wave = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return wave
+
+    def put(self, key: str, wave: np.ndarray):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, wave)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".npy"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # evicted by another process meanwhile
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                os.unlink(os.path.join(self.directory, name))
+
+    # ------------------- Cached renders -------------------
+    def layer_wave(self, layer, seed=None, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+        """generate_layer_wave through the cache."""
+        if seed is None and uses_rng(layer):
+            return generate_layer_wave(layer, seed, sample_rate=sample_rate)
+        key = render_key("layer", _layer_state(layer, seed), sample_rate)
+        wave = self.get(key)
+        if wave is None:
+            wave = generate_layer_wave(layer, seed, sample_rate=sample_rate)
+            self.put(key, wave)
+        return wave
+
+    def final_wave(self, layers: list, target="peak", level=None, buses: list = None,
+                   sample_rate: int = SAMPLE_RATE, layout: str = "Stereo", dynamics=None,
+                   render=generate_final_wave) -> np.ndarray:
+        """generate_final_wave (or ``render``, which takes the same arguments) through the cache."""
+        if any(layer.seed is None and uses_rng(layer) for layer in layers):
+            return render(layers, target, level, buses=buses, sample_rate=sample_rate, layout=layout,
+                          dynamics=dynamics)
+        payload = {
+            "layers": [_layer_state(layer, layer.seed) for layer in layers],
+            "buses": [bus.to_dict() for bus in buses or []],
+            "target": target,
+            "level": level,
+            "layout": layout,
+            "dynamics": dynamics.to_dict() if dynamics is not None else None,
+        }
+        key = render_key("mix", payload, sample_rate)
+        wave = self.get(key)
+        if wave is None:
+            wave = render(layers, target, level, buses=buses, sample_rate=sample_rate, layout=layout,
+                          dynamics=dynamics)
+            self.put(key, wave)
+        return wave
+
+
+class LayerCache:
+    """
+    In memory, each layer's share of the mix (a LayerPart) keyed on the
+    layer's state plus the keys of the layers modulating it, and each bus's
+    output keyed on the parts feeding it. A mix after an edit re-renders the
+    edited layer, the layers it modulates and the buses they feed; every
+    other part is reused. Once ``invalidate`` has been called, it is trusted
+    to report every in-place edit (LayerModel change sets), and layers
+    outside the reported set keep their key without being re-hashed.
+    """
+    def __init__(self, max_bytes: int = LAYER_CACHE_BYTES, block_size: int = BLOCK_SIZE):
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.rendered = []  # indices of the layers the last final_wave had to render
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._tracking = False
+        self._dirty = ALL
+        self._last = None  # (signature, [(key, source keys)] per layer) of the last mix
+
+    def invalidate(self, changes):
+        """Records a LayerModel notification: a set of (index, field) pairs, or ALL."""
+        self._tracking = True
+        if changes is ALL or self._dirty is ALL:
+            self._dirty = ALL
+        else:
+            self._dirty |= {index for index, _ in changes}
+
+    def _get(self, key):
+        entry = self._entries.get(key) if key is not None else None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry, nbytes: int):
+        if key is None or nbytes > self.max_bytes:
+            return
+        self._entries[key] = (entry, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def final_wave(self, layers: list, target="peak", level=None, buses: list = None,
+                   sample_rate: int = SAMPLE_RATE, layout: str = "Stereo", dynamics=None) -> np.ndarray:
+        """generate_final_wave from cached layer parts wherever their layer is unchanged."""
+        channels = channel_count(layout)
+        dirty, self._dirty = self._dirty, (set() if self._tracking else ALL)
+        self.rendered = []
+        if not layers:
+            return np.zeros((1, channels))
+        routes = resolve_routes(layers)
+        order = render_order(layers, routes)
+        audible, needed = needed_layers(layers, routes, order)
+        check_sends(layers, {bus.name for bus in buses or []})
+        seeds = layer_seeds(layers)
+
+        signature = (len(layers), sample_rate, layout, self.block_size)
+        last = self._last[1] if self._last is not None and self._last[0] == signature and dirty is not ALL else None
+        keys, sources, parts = [None] * len(layers), [()] * len(layers), [None] * len(layers)
+        for i in order:
+            if i not in needed:
+                continue
+            sources[i] = tuple((keys[src], mod_type, depth) for src, mod_type, depth in routes[i])
+            if last is not None and i not in dirty and last[i][1] == sources[i]:
+                keys[i] = last[i][0]
+            elif not (layers[i].seed is None and uses_rng(layers[i])) and all(k for k, _, _ in sources[i]):
+                keys[i] = render_key("part", {"layer": _layer_state(layers[i], seeds[i]), "sources": sources[i],
+                                              "layout": layout, "block": self.block_size}, sample_rate)
+            entry = self._get(keys[i])
+            if entry is None:
+                part = render_layer_part(layers[i], seeds[i], routes[i], {src: parts[src] for src, _, _ in routes[i]},
+                                         self.block_size, sample_rate, layout)
+                self._put(keys[i], part, part.nbytes)
+                self.rendered.append(i)
+            else:
+                part = entry[0]
+            parts[i] = part
+        self._last = (signature, list(zip(keys, sources)))
+
+        # Dry parts and bus returns are summed in the same order as iter_final_wave
+        length = mix_length(layers, sample_rate)
+        mix = np.zeros((length, channels))
+        for part, heard in zip(parts, audible):
+            if part is not None and heard:
+                mix[:len(part.dry)] += part.dry
+        for bus in buses or []:
+            feeding = [i for i, part in enumerate(parts) if part is not None and audible[i] and bus.name in part.sends]
+            key = None
+            if all(keys[i] for i in feeding):
+                key = render_key("bus", {"bus": bus.to_dict(), "parts": [keys[i] for i in feeding], "length": length,
+                                         "layout": layout, "block": self.block_size}, sample_rate)
+            entry = self._get(key)
+            if entry is None:
+                sends = np.zeros((length, channels))
+                for i in feeding:
+                    sends[:len(parts[i].dry)] += parts[i].sends[bus.name]
+                stream = BusStream(bus, sample_rate, channels)
+                for start in range(0, length, self.block_size):
+                    sends[start:start + self.block_size] = stream.process(sends[start:start + self.block_size])
+                self._put(key, sends, sends.nbytes)
+                entry = (sends,)
+            mix += entry[0]
+
+        if dynamics is not None:
+            master = DynamicsStream(dynamics, sample_rate, channels)
+            blocks = [master.process(mix[start:start + self.block_size]) for start in range(0, length, self.block_size)]
+            mix = np.concatenate(blocks + [master.flush()])
+        meter = BlockMeter(sample_rate, channels, loudness_weights(layout), loudness=target == "lufs")
+        meter.process(mix)
+        mix *= normalization_gain(meter, target, level)
+        return mix
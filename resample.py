@@ -0,0 +1,27 @@
+import numpy as np
+from fractions import Fraction
+from functools import lru_cache
+from scipy.signal import firwin, resample_poly
+
+MAX_DENOMINATOR = 1000
+
+def rate_fraction(ratio: float, max_denominator: int = MAX_DENOMINATOR) -> tuple[int, int]:
+    """(up, down) integers approximating an output/input rate ``ratio``."""
+    frac = Fraction(ratio).limit_denominator(max_denominator)
+    return frac.numerator, frac.denominator
+
+@lru_cache(maxsize=64)
+def polyphase_filter(up: int, down: int) -> np.ndarray:
+    # Same Kaiser-windowed lowpass resample_poly designs by default, built once per ratio
+    max_rate = max(up, down)
+    return firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+
+def filter_delay(up: int, down: int) -> int:
+    """Input samples of look-ahead the polyphase filter needs around each output."""
+    return 10 * max(up, down) // up + 1
+
+def resample(wave: np.ndarray, up: int, down: int) -> np.ndarray:
+    """Polyphase resampling by up/down along the first axis, with a cached filter."""
+    if up == down:
+        return np.array(wave, dtype=float)
+    return resample_poly(wave, up, down, axis=0, window=polyphase_filter(up, down))
@@ -0,0 +1,40 @@
+from graphlib import TopologicalSorter, CycleError
+
+MOD_TYPES = ["FM", "AM", "Ring"]
+
+def resolve_routes(layers: list) -> list[list[tuple[int, str, float]]]:
+    """
+    Per-layer list of (source index, type, depth) built from each layer's
+    ``mod_sources``, where sources are referenced by layer name.
+    FM depth is in Hz per unit of source amplitude; AM and Ring depth in %.
+    """
+    by_name = {}
+    for i, layer in enumerate(layers):
+        by_name.setdefault(layer.name, []).append(i)
+
+    routes = []
+    for layer in layers:
+        resolved = []
+        for route in layer.mod_sources:
+            name = route.get("source")
+            matches = by_name.get(name, [])
+            if not matches:
+                raise ValueError(f"{layer.name}: unknown modulation source {name!r}")
+            if len(matches) > 1:
+                raise ValueError(f"{layer.name}: modulation source {name!r} matches several layers")
+            mod_type = route.get("type", "FM")
+            if mod_type not in MOD_TYPES:
+                raise ValueError(f"{layer.name}: unknown modulation type {mod_type!r}")
+            resolved.append((matches[0], mod_type, route.get("depth", 100)))
+        routes.append(resolved)
+    return routes
+
+def render_order(layers: list, routes=None) -> list[int]:
+    """Layer indices with every modulation source ahead of its targets; rejects cycles."""
+    routes = resolve_routes(layers) if routes is None else routes
+    graph = {i: {src for src, _, _ in layer_routes} for i, layer_routes in enumerate(routes)}
+    try:
+        return list(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        cycle = " -> ".join(layers[i].name for i in e.args[1])
+        raise ValueError(f"Modulation routing has a cycle: {cycle}") from None
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+from collections import OrderedDict
+from scipy.io import wavfile
+
+from resample import rate_fraction, resample, filter_delay
+
+CACHE_BYTES = 64 * 2**20  # resampled buffers kept across renders
+
+_cache = OrderedDict()  # (path, mtime, up, down) -> (wave, complete)
+_cache_bytes = 0
+
+def open_sample(path: str):
+    """Memory-maps a WAV file; returns (sample_rate, frames) without decoding it."""
+    return wavfile.read(path, mmap=True)
+
+def to_float_mono(frames: np.ndarray) -> np.ndarray:
+    if frames.dtype == np.uint8:
+        wave = (frames.astype(np.float32) - 128) / 128
+    elif np.issubdtype(frames.dtype, np.integer):
+        wave = frames.astype(np.float32) / -np.iinfo(frames.dtype).min
+    else:
+        wave = np.asarray(frames, dtype=np.float32)
+    return wave.mean(axis=1) if wave.ndim > 1 else wave
+
+def _store(key, value):
+    global _cache_bytes
+    if key in _cache:
+        _cache_bytes -= _cache.pop(key)[0].nbytes
+    _cache[key] = value
+    _cache_bytes += value[0].nbytes
+    while _cache_bytes > CACHE_BYTES and len(_cache) > 1:
+        _cache_bytes -= _cache.popitem(last=False)[1][0].nbytes
+
+def pitched_sample(path: str, length: int, sample_rate: int, pitch: float = 1.0) -> np.ndarray:
+    """
+    First ``length`` samples of the file at ``sample_rate``, played back ``pitch``
+    times faster. Only the source frames those samples need are read from the
+    memory map, and the resampled result is cached per (file, rate ratio).
+    """
+    file_rate, frames = open_sample(path)
+    up, down = rate_fraction(sample_rate / (file_rate * pitch))
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns, up, down)
+
+    cached = _cache.get(key)
+    if cached is not None and (cached[1] or len(cached[0]) >= length):
+        _cache.move_to_end(key)
+        return cached[0]
+
+    needed = min(len(frames), -(-length * down // up) + filter_delay(up, down))
+    complete = needed == len(frames)
+    wave = resample(to_float_mono(frames[:needed]), up, down)
+    if not complete:
+        wave = wave[:length]
+    wave.setflags(write=False)
+    _store(key, (wave, complete))
+    return wave
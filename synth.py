@@ -1,98 +1,413 @@
 import numpy as np
 from scipy.signal import square, sawtooth
-from effects import normalize, lowpass_filter, distortion, bitcrusher, multitap_reverb
+from effects import distortion, bitcrusher, lowpass_tail, LowpassState, TimeVaryingLowpass, MultitapReverb
+from envelope import apply_envelope, envelope_end
+from oscillator import sweep_phase
+from sample import pitched_sample
+from granular import GrainCloud
+from noise import NoiseSource, white_noise
+from routing import resolve_routes, render_order
+from automation import automation_values, check_automation
 from layer import Layer
+from bus import Bus
+from metering import BlockMeter, normalization_gain
+from channels import channel_count, loudness_weights, pan_gains
+from dynamics import MasterDynamics, DynamicsStream
 
+ENGINE_VERSION = 5  # bump whenever a change alters rendered output (invalidates render caches)
 SAMPLE_RATE = 44100
+BLOCK_SIZE = 16384  # samples per block: 128 KiB of float64 stays in L2, and fewer blocks means fewer calls
+REVERB_TAPS = [0.01, 0.03, 0.05]
+SILENCE_FLOOR = 1e-6  # effect tails are cut once they decay below this (-120 dBFS)
 
-def apply_adsr(length, adsr):
-    attack = int(adsr.get("Attack", 0) * SAMPLE_RATE / 1000)
-    decay = int(adsr.get("Decay", 0) * SAMPLE_RATE / 1000)
-    release = int(adsr.get("Release", 0) * SAMPLE_RATE / 1000)
-    sustain_level = adsr.get("Sustain", 100) / 100
-
-    # Ensure lengths do not exceed total
-    total = attack + decay + release
-    if total > length:
-        scale = length / total
-        attack = int(attack * scale)
-        decay = int(decay * scale)
-        release = int(release * scale)
-
-    sustain_length = max(length - (attack + decay + release), 0)
-
-    env = np.zeros(length)
-
-    idx = 0
-    # Attack
-    if attack > 0:
-        env[idx:idx+attack] = np.linspace(0, 1, attack, endpoint=False)
-        idx += attack
-
-    # Decay
-    if decay > 0:
-        env[idx:idx+decay] = np.linspace(1, sustain_level, decay, endpoint=False)
-        idx += decay
-
-    # Sustain
-    if sustain_length > 0:
-        env[idx:idx+sustain_length] = sustain_level
-        idx += sustain_length
-
-    # Release
-    if release > 0:
-        env[idx:idx+release] = np.linspace(sustain_level, 0, release, endpoint=False)
-        idx += release
-
-    # Safety check: fill any remaining samples
-    if idx < length:
-        env[idx:] = 0
-
-    return env
-
-def generate_layer_wave(layer: Layer) -> np.ndarray:
-    length = int(SAMPLE_RATE * layer.dur)
-    t = np.linspace(0, layer.dur, length, endpoint=False)
-    freq = np.linspace(layer.freq, layer.freq_end, length)
-
-    # LFO + randomness
-    mod = layer.lfo_depth * np.sin(2 * np.pi * layer.lfo_freq * t)
-    mod += layer.randomness * np.random.uniform(-1, 1, length)
-    phase = np.cumsum(2 * np.pi * (freq + mod) / SAMPLE_RATE)
-
-    wave_map = {
-        "Sine": np.sin,
-        "Square": square,
-        "Triangle": lambda p: sawtooth(p, 0.5),
-        "Sawtooth": sawtooth,
-        "Noise": lambda p: np.random.uniform(-1, 1, len(p))
-    }
-    wave = wave_map.get(layer.waveform, lambda p: np.zeros_like(p))(phase)
-
-    # ADSR
-    wave *= apply_adsr(length, layer.adsr)
-
-    # Effects
-    if layer.filter_freq > 0: wave = lowpass_filter(wave, layer.filter_freq, SAMPLE_RATE)
-    if layer.distortion > 0: wave = distortion(wave, layer.distortion)
-    if layer.bitcrusher > 0: wave = bitcrusher(wave, layer.bitcrusher)
-    if layer.reverb > 0: wave = multitap_reverb(wave, [0.01, 0.03, 0.05], layer.reverb, SAMPLE_RATE)
-
-    # Volume + Pan
-    wave *= layer.volume
-    left = wave * np.sqrt(1 - layer.pan)
-    right = wave * np.sqrt(layer.pan)
-    return np.column_stack([left, right])
-
-def generate_final_wave(layers: list[Layer]) -> np.ndarray:
-    if not layers: return np.zeros((1, 2))
-    max_len = int(SAMPLE_RATE * max(layer.dur for layer in layers))
-    final_wave = np.zeros((max_len, 2))
+WAVE_MAP = {
+    "Sine": lambda p: np.sin(p, out=p),
+    "Square": square,
+    "Triangle": lambda p: sawtooth(p, 0.5),
+    "Sawtooth": sawtooth,
+}
+
+def apply_adsr(length, adsr, curve="Linear", sample_rate: int = SAMPLE_RATE):
+    return apply_envelope(np.ones(length), length, adsr, sample_rate, curve=curve)
+
+
+class LayerStream:
+    """
+    Renders one layer block by block. Oscillator phase, filter state and the
+    reverb delay line are carried between blocks, so the concatenated blocks
+    match a single full-length render. Rendering stops at ``active``, where
+    the envelope and effect tails have died away; the rest is silence.
+    """
+    def __init__(self, layer: Layer, seed=None, sample_rate: int = SAMPLE_RATE, layout: str = "Stereo"):
+        check_automation(layer)
+        self.layer = layer
+        self.sample_rate = sample_rate
+        self.layout = layout
+        self.length = int(sample_rate * layer.dur)
+        self.pos = 0
+        self._volume = layer.volume
+        self._gains = pan_gains(layer.pan, layout)
+
+        # Separate streams so block boundaries don't change the random sequence
+        mod_seq, noise_seq = np.random.SeedSequence(seed).spawn(2)
+        self._mod_rng = np.random.default_rng(mod_seq)
+        self._noise_rng = np.random.default_rng(noise_seq)
+        self._mod_phase = 0.0
+        self._noise = (NoiseSource(layer.noise_color, sample_rate, self._noise_rng, layer.noise_table)
+                       if layer.waveform == "Noise" else None)
+        self._sample = self._load_sample() if layer.waveform in ("Sample", "Granular") else None
+        self._cloud = self._grain_cloud() if layer.waveform == "Granular" else None
+
+        if "filter_freq" in layer.automation:
+            points = layer.automation["filter_freq"]
+            self._filter = TimeVaryingLowpass(lambda idx: automation_values(points, idx, self.length), sample_rate)
+        else:
+            self._filter = LowpassState(layer.filter_freq, sample_rate) if layer.filter_freq > 0 else None
+        self._reverb = MultitapReverb(REVERB_TAPS, sample_rate)
+        self._scratch = np.empty(0)
+        self.active = self._active_length()
+
+    @property
+    def done(self) -> bool:
+        return self.pos >= self.active
+
+    def render(self, count: int) -> np.ndarray:
+        """Next ``count`` samples (fewer at the end of the active range) as an (n, channels) block."""
+        wave = self.render_mono(count)
+        out = np.zeros((len(wave), channel_count(self.layout)))
+        self.mix_into(out, wave)
+        return out
+
+    def render_mono(self, count: int, mods=()) -> np.ndarray:
+        """
+        Next ``count`` samples of the layer's signal before volume and pan, which
+        is also what it feeds to the layers it modulates. ``mods`` holds
+        (type, depth, source block) for each incoming modulation route.
+        """
+        layer = self.layer
+        start = self.pos
+        stop = min(start + count, self.active)
+        self.pos = stop
+        n = stop - start
+
+        fm = None
+        for mod_type, depth, source in mods:
+            if mod_type == "FM":
+                fm = depth * _fit(source, n) if fm is None else fm + depth * _fit(source, n)
+        wave = self._oscillator(start, stop, fm)
+
+        # AM / ring modulation
+        for mod_type, depth, source in mods:
+            if mod_type == "AM":
+                wave *= 1 + depth / 100 * _fit(source, n)
+            elif mod_type == "Ring":
+                wave *= (1 - depth / 100) + depth / 100 * _fit(source, n)
+
+        # ADSR
+        apply_envelope(wave, self.length, layer.adsr, self.sample_rate, start, layer.adsr_curve)
+
+        # Effects (elementwise stages run in place on the block)
+        if self._filter is not None: wave = self._filter.process(wave)
+        drive = self._param("distortion", start, stop)
+        if np.any(drive > 0): distortion(wave, drive, out=wave)
+        if layer.bitcrusher > 0: bitcrusher(wave, layer.bitcrusher, out=wave)
+        if layer.reverb > 0: self._reverb.process(wave, layer.reverb)
+
+        # Volume and pan for this block, used by mix_into / pan_into
+        self._volume = self._param("volume", start, stop)
+        if "pan" in layer.automation:
+            self._gains = pan_gains(self._param("pan", start, stop), self.layout)
+        return wave
+
+    def _active_length(self) -> int:
+        # Past the envelope's end plus the filter and reverb tails the layer is
+        # silent. The bitcrusher turns any negative filter ring-out into a full
+        # step (and silence into a DC offset when its step count is odd), so
+        # with it active the layer only stops early if its input ends in exact zeros
+        layer = self.layer
+        if layer.bitcrusher > 0 and (self._filter is not None or bitcrusher(np.zeros(1), layer.bitcrusher)[0] != 0):
+            return self.length
+        end = envelope_end(self.length, layer.adsr, self.sample_rate)
+        if self._filter is not None:
+            points = layer.automation.get("filter_freq")
+            cutoff = min(v for _, v in points) if points else layer.filter_freq
+            # Distortion scales the ring-out by up to its drive before tanh flattens it
+            points = layer.automation.get("distortion")
+            drive = 1 + 5 * min(max(max(v for _, v in points) if points else layer.distortion, 0), 100) / 100
+            end += lowpass_tail(max(cutoff, 1), self.sample_rate, SILENCE_FLOOR / drive)
+        if layer.reverb > 0:
+            end += max(self._reverb.delays)
+        return min(end, self.length)
+
+    def _param(self, name, start, stop):
+        # Automated parameters become per-sample arrays for the block
+        points = self.layer.automation.get(name)
+        if points is None:
+            return getattr(self.layer, name)
+        return automation_values(points, np.arange(start, stop), self.length)
+
+    def mix_into(self, out: np.ndarray, wave: np.ndarray):
+        """
+        Adds ``wave`` with volume and pan applied straight into the interleaved
+        block ``out``. Leaves ``wave`` scaled by the layer volume, ready for
+        post-fader sends.
+        """
+        wave *= self._volume
+        self.pan_into(out, wave)
+
+    def pan_into(self, out: np.ndarray, wave: np.ndarray, scale: float = 1.0):
+        # A channel at a time through a reusable scratch buffer, by the gain
+        # (or per-sample gain column); broadcasting over the short channel
+        # axis instead is several times slower
+        if len(self._scratch) < len(wave):
+            self._scratch = np.empty(len(wave))
+        scratch = self._scratch[:len(wave)]
+        gains = self._gains if scale == 1 else self._gains * scale
+        for c in range(out.shape[1]):
+            np.multiply(wave, gains[..., c], out=scratch)
+            out[:, c] += scratch
+
+    def _oscillator(self, start, stop, fm=None):
+        layer = self.layer
+        n = stop - start
+        if n == 0:
+            return np.zeros(0)
+        if layer.waveform == "Noise":
+            return self._noise.render(n)
+        if layer.waveform == "Granular":
+            return self._cloud.render(start, stop)
+        if layer.waveform == "Sample":
+            wave = np.zeros(n)
+            src = self._sample[start:stop]
+            wave[:len(src)] = src
+            return wave
+
+        idx = np.arange(start, stop)
+        phase = sweep_phase(idx, self.length, layer.freq, layer.freq_end, self.sample_rate,
+                            layer.sweep, layer.sweep_curve)
+
+        # LFO, randomness and FM are the only terms that need a running sum
+        if (layer.lfo_depth and layer.lfo_freq) or layer.randomness or fm is not None:
+            mod = layer.lfo_depth * np.sin(2 * np.pi * layer.lfo_freq * idx / self.sample_rate)
+            if layer.randomness:
+                mod += layer.randomness * white_noise(self._mod_rng, n)
+            if fm is not None:
+                mod += fm
+            mod_phase = self._mod_phase + np.cumsum(2 * np.pi * mod / self.sample_rate)
+            self._mod_phase = mod_phase[-1]
+            phase += mod_phase
+        elif self._mod_phase:
+            phase += self._mod_phase  # keep the offset once modulation stops
+
+        return WAVE_MAP.get(layer.waveform, np.zeros_like)(phase)
+
+    def _load_sample(self):
+        # Pitch follows freq relative to the sample's root; sweeps don't apply
+        layer = self.layer
+        if not layer.sample_path:
+            return np.zeros(0)
+        pitch = layer.freq / layer.sample_root if layer.freq > 0 and layer.sample_root > 0 else 1.0
+        grain_len = int(layer.grain_size * self.sample_rate / 1000) if layer.waveform == "Granular" else 0
+        return pitched_sample(layer.sample_path, self.length + grain_len, self.sample_rate, pitch)
+
+    def _grain_cloud(self):
+        # Grains come from the sample when one is set, otherwise from a second of noise
+        layer = self.layer
+        source = self._sample if len(self._sample) else white_noise(self._noise_rng, self.sample_rate)
+        return GrainCloud(source, self.length, self.sample_rate, layer.grain_size, layer.grain_density,
+                          layer.grain_jitter, self._noise_rng)
+
+
+class BusStream:
+    """Runs a bus's effect chain once per block on the summed sends."""
+    def __init__(self, bus: Bus, sample_rate: int = SAMPLE_RATE, channels: int = 2):
+        self.bus = bus
+        self._filter = LowpassState(bus.filter_freq, sample_rate, channels) if bus.filter_freq > 0 else None
+        self._reverb = MultitapReverb(REVERB_TAPS, sample_rate, channels)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        bus = self.bus
+        if self._filter is not None: block = self._filter.process(block)
+        if bus.reverb > 0: self._reverb.process(block, bus.reverb)
+        block *= bus.volume
+        return block
+
+
+def _fit(block: np.ndarray, n: int) -> np.ndarray:
+    # A modulation source that has already ended contributes silence
+    if len(block) >= n:
+        return block[:n]
+    return np.concatenate([block, np.zeros(n - len(block))])
+
+def generate_layer_wave(layer: Layer, seed=None, block_size: int = BLOCK_SIZE,
+                        sample_rate: int = SAMPLE_RATE, layout: str = "Stereo") -> np.ndarray:
+    stream = LayerStream(layer, seed, sample_rate, layout)
+    out = np.zeros((stream.length, channel_count(layout)))
+    for start in range(0, stream.active, block_size):
+        wave = stream.render_mono(block_size)
+        stream.mix_into(out[start:start + len(wave)], wave)
+    return out
+
+def layer_seeds(layers: list[Layer]) -> list:
+    """Per-layer seeds; layers without a fixed seed get fresh entropy for this render."""
+    return [layer.seed if layer.seed is not None else np.random.SeedSequence().entropy for layer in layers]
+
+def mix_length(layers: list[Layer], sample_rate: int = SAMPLE_RATE) -> int:
+    return int(sample_rate * max(layer.dur for layer in layers)) if layers else 1
+
+def needed_layers(layers: list[Layer], routes: list, order: list[int]):
+    """
+    (audible flag per layer, set of layer indices to render). Layers muted by
+    volume are skipped, unless they modulate a layer that is heard.
+    """
+    audible = [layer.volume != 0 or "volume" in layer.automation for layer in layers]
+    needed = {i for i, heard in enumerate(audible) if heard}
+    for i in reversed(order):
+        if i in needed:
+            needed.update(src for src, _, _ in routes[i])
+    return audible, needed
+
+def check_sends(layers: list[Layer], bus_names):
     for layer in layers:
-        wave = generate_layer_wave(layer)
-        if len(wave) < max_len:
-            padded = np.zeros((max_len, 2))
-            padded[:len(wave)] = wave
-            wave = padded
-        final_wave += wave
-    return normalize(final_wave)
+        for name in layer.sends:
+            if name not in bus_names:
+                raise ValueError(f"{layer.name}: sends to unknown bus {name!r}")
+
+
+class LayerPart:
+    """
+    One layer's share of a mix, rendered on its own: ``mono`` is its signal
+    up to its active length (what it feeds the layers it modulates), ``dry``
+    its (n, channels) output after volume and pan, and ``sends`` its
+    post-fader send to each bus it feeds.
+    """
+    def __init__(self, mono: np.ndarray, dry: np.ndarray, sends: dict):
+        self.mono = mono
+        self.dry = dry
+        self.sends = sends
+
+    @property
+    def nbytes(self) -> int:
+        return self.mono.nbytes + self.dry.nbytes + sum(send.nbytes for send in self.sends.values())
+
+def render_layer_part(layer: Layer, seed, routes: list, sources: dict, block_size: int = BLOCK_SIZE,
+                      sample_rate: int = SAMPLE_RATE, layout: str = "Stereo") -> LayerPart:
+    """
+    Renders one layer of a mix as iter_final_wave would, on the same block
+    grid. ``routes`` are its incoming (source index, type, depth) routes and
+    ``sources`` maps each source index to that layer's LayerPart.
+    """
+    stream = LayerStream(layer, seed, sample_rate, layout)
+    channels = channel_count(layout)
+    mono = np.empty(stream.active)
+    dry = np.zeros((stream.active, channels))
+    sends = {name: np.zeros((stream.active, channels)) for name, amount in layer.sends.items() if amount > 0}
+    for start in range(0, stream.active, block_size):
+        # A source that has already gone silent feeds nothing, as in the mix loop
+        mods = [(mod_type, depth, sources[src].mono[start:start + block_size]) for src, mod_type, depth in routes
+                if start < len(sources[src].mono)]
+        wave = stream.render_mono(block_size, mods)
+        stop = start + len(wave)
+        mono[start:stop] = wave
+        stream.mix_into(dry[start:stop], wave)
+        for name, send in sends.items():
+            stream.pan_into(send[start:stop], wave, layer.sends[name] / 100)
+    return LayerPart(mono, dry, sends)
+
+def iter_final_wave(layers: list[Layer], seeds=None, block_size: int = BLOCK_SIZE, buses: list[Bus] = None,
+                    sample_rate: int = SAMPLE_RATE, layout: str = "Stereo", dynamics: MasterDynamics = None):
+    """
+    Yields the un-normalized mix as consecutive (n, channels) blocks, through
+    the master ``dynamics`` if given. Its lookahead is compensated, so the
+    first block comes out that much shorter and one extra block ends the mix.
+    """
+    channels = channel_count(layout)
+    if not layers:
+        yield np.zeros((1, channels))
+        return
+    master = DynamicsStream(dynamics, sample_rate, channels) if dynamics is not None else None
+    seeds = layer_seeds(layers) if seeds is None else seeds
+    max_len = mix_length(layers, sample_rate)
+    streams = [LayerStream(layer, seed, sample_rate, layout) for layer, seed in zip(layers, seeds)]
+    routes = resolve_routes(layers)
+    order = render_order(layers, routes)
+    audible, needed = needed_layers(layers, routes, order)
+    bus_streams = {bus.name: BusStream(bus, sample_rate, channels) for bus in buses or []}
+    check_sends(layers, bus_streams)
+
+    for start in range(0, max_len, block_size):
+        n = min(block_size, max_len - start)
+
+        # Each layer renders once per block, sources first; targets read the
+        # same buffer however many of them a source feeds
+        outputs = [None] * len(layers)
+        for i in order:
+            if i in needed and not streams[i].done:
+                mods = [(mod_type, depth, outputs[src]) for src, mod_type, depth in routes[i]
+                        if outputs[src] is not None]
+                outputs[i] = streams[i].render_mono(n, mods)
+
+        block = np.zeros((n, channels))
+        sends = {name: np.zeros((n, channels)) for name in bus_streams}
+        for stream, wave, heard in zip(streams, outputs, audible):
+            if wave is not None and heard:
+                stream.mix_into(block[:len(wave)], wave)
+                for name, amount in stream.layer.sends.items():
+                    if amount > 0:
+                        stream.pan_into(sends[name][:len(wave)], wave, amount / 100)
+
+        # Bus effects run once on the summed sends, however many layers feed them
+        for name, bus_stream in bus_streams.items():
+            block += bus_stream.process(sends[name])
+        if master is not None:
+            block = master.process(block)
+            if not len(block):
+                continue
+        yield block
+
+    if master is not None:
+        tail = master.flush()
+        if len(tail):
+            yield tail
+
+def generate_final_wave(layers: list[Layer], target="peak", level=None, block_size: int = BLOCK_SIZE,
+                        buses: list[Bus] = None, sample_rate: int = SAMPLE_RATE, layout: str = "Stereo",
+                        dynamics: MasterDynamics = None) -> np.ndarray:
+    """
+    Renders and normalizes the mix. ``target`` is "peak" (dBFS), "lufs" (LUFS)
+    or None; the meter runs on each block as it is rendered, so normalizing
+    costs one in-place scale rather than separate analysis passes.
+    """
+    blocks = iter_final_wave(layers, block_size=block_size, buses=buses, sample_rate=sample_rate, layout=layout,
+                             dynamics=dynamics)
+    if not layers:
+        return next(blocks)
+    final_wave = np.empty((mix_length(layers, sample_rate), channel_count(layout)))
+    meter = BlockMeter(sample_rate, channel_count(layout), loudness_weights(layout), loudness=target == "lufs")
+    pos = 0
+    for block in blocks:
+        final_wave[pos:pos + len(block)] = block
+        meter.process(block)
+        pos += len(block)
+    final_wave *= normalization_gain(meter, target, level)
+    return final_wave
+
+def stream_final_wave(layers: list[Layer], target="peak", level=None, block_size: int = BLOCK_SIZE,
+                      buses: list[Bus] = None, sample_rate: int = SAMPLE_RATE, layout: str = "Stereo",
+                      dynamics: MasterDynamics = None):
+    """
+    Two-pass streaming render: the first pass only meters, the second re-renders
+    with the same seeds and yields normalized blocks. Never holds more than one
+    block of the mix, at the cost of synthesizing twice. With target=None
+    there is no metering pass; leveling can then be left to ``dynamics``,
+    whose limiter keeps the single pass under its ceiling.
+    """
+    seeds = layer_seeds(layers)
+    meter = BlockMeter(sample_rate, channel_count(layout), loudness_weights(layout), loudness=target == "lufs")
+    if target is not None:
+        for block in iter_final_wave(layers, seeds, block_size, buses, sample_rate, layout, dynamics):
+            meter.process(block)
+    gain = normalization_gain(meter, target, level)
+    for block in iter_final_wave(layers, seeds, block_size, buses, sample_rate, layout, dynamics):
+        block *= gain
+        yield block
@@ -1,26 +1,33 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QLabel, QSlider
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QLabel, QSlider, QComboBox
+from envelope import CURVES
 
 class AdvancedTab(QWidget):
     """
     Advanced parameters: ADSR, LFO, FX (distortion, reverb, filter)
     """
-    def __init__(self, layers, current_index, update_callback):
+    def __init__(self, model, current_index):
         super().__init__()
-        self.layers = layers
+        self.model = model
         self.current_index = current_index
-        self.update_callback = update_callback
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
         self.adsr_sliders = {}
+        self.adsr_labels = {}
         self.lfo_sliders = {}
         self.fx_sliders = {}
+        self.grain_sliders = {}
 
         self._init_adsr_group()
         self._init_lfo_group()
         self._init_fx_group()
+        self._init_grain_group()
         self.load_layer()
 
+    @property
+    def layers(self):
+        return self.model.layers
+
     # ------------------- Groups -------------------
     def _init_adsr_group(self):
         group = QGroupBox("ADSR")
@@ -31,10 +38,17 @@ class AdvancedTab(QWidget):
             slider = QSlider()
             slider.setMinimum(0)
             slider.setMaximum(1000)
-            slider.valueChanged.connect(lambda val, p=param, l=label: self._update_adsr(p,l,val))
+            slider.valueChanged.connect(lambda val, p=param: self._update_adsr(p, val))
             layout.addWidget(label)
             layout.addWidget(slider)
             self.adsr_sliders[param] = slider
+            self.adsr_labels[param] = label
+
+        layout.addWidget(QLabel("Curve:"))
+        self.curve_dropdown = QComboBox()
+        self.curve_dropdown.addItems(CURVES)
+        self.curve_dropdown.currentTextChanged.connect(self._update_curve)
+        layout.addWidget(self.curve_dropdown)
         self.layout.addWidget(group)
 
     def _init_lfo_group(self):
@@ -98,43 +112,81 @@ class AdvancedTab(QWidget):
         }
         self.layout.addWidget(group)
 
+    def _init_grain_group(self):
+        group = QGroupBox("Granular")
+        layout = QVBoxLayout()
+        group.setLayout(layout)
+
+        self.grain_labels = {}
+        for param, title, lo, hi in [("grain_size", "Grain Size", 5, 200),
+                                     ("grain_density", "Grain Density", 1, 2000),
+                                     ("grain_jitter", "Grain Jitter", 0, 100)]:
+            label = QLabel(f"{title}: 0")
+            slider = QSlider()
+            slider.setMinimum(lo)
+            slider.setMaximum(hi)
+            slider.valueChanged.connect(lambda val, p=param: self._update_grain(p, val))
+            layout.addWidget(label)
+            layout.addWidget(slider)
+            self.grain_labels[param] = (label, title)
+            self.grain_sliders[param] = slider
+        self.layout.addWidget(group)
+
     # ------------------- Load Layer -------------------
     def load_layer(self):
+        # Signals are blocked so showing a layer never writes it back
         layer = self.layers[self.current_index]
-        for param in ["Attack","Decay","Sustain","Release"]:
-            self.adsr_sliders[param].setValue(layer.adsr.get(param,0))
-
-        # Cast floats to int (scaled if needed)
-        self.lfo_freq_slider.setValue(int(layer.lfo_freq * 10))  # scaled
-        self.lfo_depth_slider.setValue(int(layer.lfo_depth))
-        self.dist_slider.setValue(layer.distortion)
-        self.reverb_slider.setValue(layer.reverb)
-        self.filter_slider.setValue(layer.filter_freq)
+        widgets = [self.curve_dropdown, *self.adsr_sliders.values(), *self.lfo_sliders.values(),
+                   *self.fx_sliders.values(), *self.grain_sliders.values()]
+        for widget in widgets:
+            widget.blockSignals(True)
+        try:
+            for param in ["Attack","Decay","Sustain","Release"]:
+                self.adsr_sliders[param].setValue(layer.adsr.get(param,0))
+            self.curve_dropdown.setCurrentText(layer.adsr_curve)
+
+            # Cast floats to int (scaled if needed)
+            self.lfo_freq_slider.setValue(int(layer.lfo_freq * 10))  # scaled
+            self.lfo_depth_slider.setValue(int(layer.lfo_depth))
+            self.dist_slider.setValue(int(layer.distortion))
+            self.reverb_slider.setValue(int(layer.reverb))
+            self.filter_slider.setValue(int(layer.filter_freq))
+            for param, slider in self.grain_sliders.items():
+                slider.setValue(int(getattr(layer, param)))
+        finally:
+            for widget in widgets:
+                widget.blockSignals(False)
+        self._update_labels(layer)
+
+    def _update_labels(self, layer):
+        for param, label in self.adsr_labels.items():
+            value = layer.adsr.get(param, 0)
+            label.setText(f"{param}: {value/100:.2f}" if param=="Sustain" else f"{param}: {value} ms")
+        self.lfo_freq_label.setText(f"LFO Frequency: {layer.lfo_freq:.1f} Hz")
+        self.lfo_depth_label.setText(f"LFO Depth: {layer.lfo_depth} Hz")
+        self.dist_label.setText(f"Distortion: {layer.distortion}%")
+        self.reverb_label.setText(f"Reverb: {layer.reverb}%")
+        self.filter_label.setText(f"Lowpass Filter: {layer.filter_freq} Hz")
+        for param, (label, title) in self.grain_labels.items():
+            unit = {"grain_size": " ms", "grain_density": "/s", "grain_jitter": "%"}[param]
+            label.setText(f"{title}: {getattr(layer, param)}{unit}")
 
     # ------------------- Update -------------------
-    def _update_adsr(self, param, label, value):
-        layer = self.layers[self.current_index]
-        layer.adsr[param] = value
-        label.setText(f"{param}: {value/100:.2f}" if param=="Sustain" else f"{param}: {value} ms")
-        self.update_callback()
+    def _set(self, field, value):
+        self.model.set(self.current_index, field, value)
+        self._update_labels(self.layers[self.current_index])
+
+    def _update_adsr(self, param, value):
+        self._set("adsr." + param, value)
+
+    def _update_curve(self, curve):
+        self._set("adsr_curve", curve)
+
+    def _update_grain(self, param, value):
+        self._set(param, value)
 
     def _update_lfo(self, typ, value):
-        layer = self.layers[self.current_index]
-        if typ=="freq":
-            layer.lfo_freq = value
-            self.lfo_freq_label.setText(f"LFO Frequency: {value:.1f} Hz")
-        else:
-            layer.lfo_depth = value
-            self.lfo_depth_label.setText(f"LFO Depth: {value} Hz")
-        self.update_callback()
+        self._set("lfo_" + typ, value)
 
     def _update_fx(self, param, value):
-        layer = self.layers[self.current_index]
-        setattr(layer, param, value)
-        if param=="distortion":
-            self.dist_label.setText(f"Distortion: {value}%")
-        elif param=="reverb":
-            self.reverb_label.setText(f"Reverb: {value}%")
-        else:
-            self.filter_label.setText(f"Lowpass Filter: {value} Hz")
-        self.update_callback()
+        self._set(param, value)
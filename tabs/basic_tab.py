@@ -1,18 +1,22 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QComboBox
+import os
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QComboBox, QPushButton, QFileDialog
+from oscillator import SWEEPS
+from noise import NOISE_COLORS
 
 class BasicTab(QWidget):
     """
     Basic SFX parameters: waveform, frequency, duration.
     """
-    def __init__(self, layers, current_index, update_callback):
+    def __init__(self, model, current_index):
         super().__init__()
-        self.layers = layers
+        self.model = model
         self.current_index = current_index
-        self.update_callback = update_callback
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
         self.waveform_dropdown = QComboBox()
+        self.sweep_dropdown = QComboBox()
+        self.noise_dropdown = QComboBox()
         self.freq_slider = QSlider()
         self.freq_label = QLabel()
         self.dur_slider = QSlider()
@@ -21,48 +25,91 @@ class BasicTab(QWidget):
         self._init_ui()
         self.load_layer()
 
+    @property
+    def layers(self):
+        return self.model.layers
+
     def _init_ui(self):
         # Waveform
         wf_layout = QHBoxLayout()
         wf_layout.addWidget(QLabel("Waveform:"))
-        self.waveform_dropdown.addItems(["Sine","Square","Triangle","Sawtooth","Noise"])
-        self.waveform_dropdown.currentIndexChanged.connect(lambda _: self.update_layer())
+        self.waveform_dropdown.addItems(["Sine","Square","Triangle","Sawtooth","Noise","Sample","Granular"])
+        self.waveform_dropdown.currentTextChanged.connect(lambda text: self._set("waveform", text))
         wf_layout.addWidget(self.waveform_dropdown)
+        self.sample_btn = QPushButton("Sample...")
+        self.sample_btn.clicked.connect(self.choose_sample)
+        wf_layout.addWidget(self.sample_btn)
         self.layout.addLayout(wf_layout)
 
+        # Noise color
+        noise_layout = QHBoxLayout()
+        noise_layout.addWidget(QLabel("Noise:"))
+        self.noise_dropdown.addItems(NOISE_COLORS)
+        self.noise_dropdown.currentTextChanged.connect(lambda text: self._set("noise_color", text))
+        noise_layout.addWidget(self.noise_dropdown)
+        self.layout.addLayout(noise_layout)
+
         # Frequency
         freq_layout = QHBoxLayout()
         self.freq_label.setText("Frequency: 440 Hz")
         self.freq_slider.setMinimum(100)
         self.freq_slider.setMaximum(5000)
-        self.freq_slider.valueChanged.connect(lambda _: self.update_layer())
+        self.freq_slider.valueChanged.connect(lambda val: self._set("freq", val))
         freq_layout.addWidget(self.freq_label)
         freq_layout.addWidget(self.freq_slider)
         self.layout.addLayout(freq_layout)
 
+        # Sweep
+        sweep_layout = QHBoxLayout()
+        sweep_layout.addWidget(QLabel("Sweep:"))
+        self.sweep_dropdown.addItems(SWEEPS)
+        self.sweep_dropdown.currentTextChanged.connect(lambda text: self._set("sweep", text))
+        sweep_layout.addWidget(self.sweep_dropdown)
+        self.layout.addLayout(sweep_layout)
+
         # Duration
         dur_layout = QHBoxLayout()
         self.dur_label.setText("Duration: 0.5 s")
         self.dur_slider.setMinimum(50)
         self.dur_slider.setMaximum(2000)
-        self.dur_slider.valueChanged.connect(lambda _: self.update_layer())
+        self.dur_slider.valueChanged.connect(lambda val: self._set("dur", val/1000))
         dur_layout.addWidget(self.dur_label)
         dur_layout.addWidget(self.dur_slider)
         self.layout.addLayout(dur_layout)
 
+    def choose_sample(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load Sample", "", "WAV Files (*.wav)")
+        if not path:
+            return
+        with self.model.transaction():
+            self.model.set(self.current_index, "sample_path", path)
+            self.sample_btn.setText(os.path.basename(path))
+            self.waveform_dropdown.setCurrentText("Sample")
+
     def load_layer(self):
+        # Widgets are only shown the layer's values here; with their signals
+        # blocked nothing is written back, so switching layers renders nothing
         layer = self.layers[self.current_index]
-        self.waveform_dropdown.setCurrentText(layer.waveform)
-        self.freq_slider.setValue(layer.freq)
-        self.freq_label.setText(f"Frequency: {layer.freq} Hz")
-        self.dur_slider.setValue(int(layer.dur*1000))
-        self.dur_label.setText(f"Duration: {layer.dur:.2f} s")
+        widgets = [self.waveform_dropdown, self.sweep_dropdown, self.noise_dropdown, self.freq_slider, self.dur_slider]
+        for widget in widgets:
+            widget.blockSignals(True)
+        try:
+            self.waveform_dropdown.setCurrentText(layer.waveform)
+            self.sample_btn.setText(os.path.basename(layer.sample_path) or "Sample...")
+            self.sweep_dropdown.setCurrentText(layer.sweep)
+            self.noise_dropdown.setCurrentText(layer.noise_color)
+            self.freq_slider.setValue(int(layer.freq))
+            self.dur_slider.setValue(int(layer.dur*1000))
+        finally:
+            for widget in widgets:
+                widget.blockSignals(False)
+        self._update_labels(layer)
 
-    def update_layer(self):
-        layer = self.layers[self.current_index]
-        layer.waveform = self.waveform_dropdown.currentText()
-        layer.freq = self.freq_slider.value()
+    def _set(self, field, value):
+        # Each widget writes only its own field
+        self.model.set(self.current_index, field, value)
+        self._update_labels(self.layers[self.current_index])
+
+    def _update_labels(self, layer):
         self.freq_label.setText(f"Frequency: {layer.freq} Hz")
-        layer.dur = self.dur_slider.value()/1000
         self.dur_label.setText(f"Duration: {layer.dur:.2f} s")
-        self.update_callback()
@@ -0,0 +1,142 @@
+import os
+import json
+import argparse
+import numpy as np
+
+from layer import Layer
+from synth import SAMPLE_RATE, generate_final_wave
+from metering import BlockMeter, normalization_gain
+from preset_manager import DEFAULT_PRESETS, PresetManager
+from resample import rate_fraction, resample
+from channels import LAYOUTS, channel_count, loudness_weights
+from export import write_wav
+
+class Event:
+    """
+    One preset hit on a timeline: ``preset`` is a built-in preset name or a
+    preset file (relative to the timeline file), ``start`` is in seconds,
+    ``gain`` is linear and ``pitch`` is in semitones (varispeed, so pitching
+    up also shortens the sound).
+    """
+    def __init__(self, preset="Laser", start=0.0, gain=1.0, pitch=0.0, seed=None):
+        self.preset = preset
+        self.start = start
+        self.gain = gain
+        self.pitch = pitch
+        self.seed = seed  # Seeds layers that have none; distinct seeds give distinct variants
+
+    def sound_key(self) -> tuple:
+        """Events with equal keys sound the same and share one render."""
+        return (self.preset, self.pitch, self.seed)
+
+    # ------------------- Serialization -------------------
+    def to_dict(self):
+        return {
+            "preset": self.preset,
+            "start": self.start,
+            "gain": self.gain,
+            "pitch": self.pitch,
+            "seed": self.seed
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("preset", "Laser"), data.get("start", 0.0), data.get("gain", 1.0),
+                   data.get("pitch", 0.0), data.get("seed", None))
+
+
+class Timeline:
+    """A sequence of preset events, saved as JSON next to the presets it uses."""
+    def __init__(self, events: list[Event] = None, base_dir: str = "."):
+        self.events = events if events is not None else []
+        self.base_dir = base_dir
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls([Event.from_dict(d) for d in data.get("events", [])], os.path.dirname(path) or ".")
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"events": [event.to_dict() for event in self.events]}, f, indent=4)
+
+    def load_sound(self, preset: str):
+        """(layers, buses, master dynamics or None) of an event's preset."""
+        if preset in DEFAULT_PRESETS:
+            return PresetManager.generate_layer_from_preset(preset), [], None
+        path = os.path.join(self.base_dir, preset)
+        return PresetManager.load_preset(path), PresetManager.load_buses(path), PresetManager.load_dynamics(path)
+
+# ------------------- Rendering -------------------
+def _seeded(layers: list[Layer], seed) -> list[Layer]:
+    if seed is None:
+        return layers
+    seeded = [Layer.from_dict(layer.to_dict()) for layer in layers]
+    for i, layer in enumerate(seeded):
+        if layer.seed is None:
+            layer.seed = seed + i
+    return seeded
+
+def render_sounds(timeline: Timeline, sample_rate: int = SAMPLE_RATE, layout: str = "Stereo",
+                  cache=None) -> dict[tuple, np.ndarray]:
+    """
+    Renders each distinct sound of the timeline once, keyed by Event.sound_key.
+    A preset is synthesized once whatever pitches it is used at; the pitched
+    versions are resampled from it. Renders go through ``cache`` (a
+    RenderCache) when given, so repeated timeline renders reuse them too.
+    """
+    presets, sounds = {}, {}
+    for event in timeline.events:
+        key = event.sound_key()
+        if key in sounds:
+            continue
+        base_key = (event.preset, 0.0, event.seed)
+        if base_key not in presets:
+            layers, buses, dynamics = timeline.load_sound(event.preset)
+            layers = _seeded(layers, event.seed)
+            render = cache.final_wave if cache is not None else generate_final_wave
+            presets[base_key] = render(layers, buses=buses, sample_rate=sample_rate, layout=layout, dynamics=dynamics)
+        up, down = rate_fraction(2 ** (-event.pitch / 12))
+        sounds[key] = presets[base_key] if up == down else resample(presets[base_key], up, down)
+    return sounds
+
+def render_timeline(timeline: Timeline, target="peak", level=None, sample_rate: int = SAMPLE_RATE,
+                    layout: str = "Stereo", cache=None) -> np.ndarray:
+    """
+    Renders the distinct sounds, then mixes every event into the output by
+    adding its gain-scaled sound into a slice, so the cost is the unique
+    sounds plus one pass over the events. Each sound is peak-normalized as in
+    the editor; ``target``/``level`` then level the whole cue.
+    """
+    channels = channel_count(layout)
+    if not timeline.events:
+        return np.zeros((1, channels))
+    sounds = render_sounds(timeline, sample_rate, layout, cache)
+    starts = [int(round(max(event.start, 0.0) * sample_rate)) for event in timeline.events]
+    length = max(start + len(sounds[event.sound_key()]) for start, event in zip(starts, timeline.events))
+    final_wave = np.zeros((length, channels))
+    scratch = np.empty((max(len(sound) for sound in sounds.values()), channels))
+    for start, event in zip(starts, timeline.events):
+        sound = sounds[event.sound_key()]
+        n = len(sound)
+        np.multiply(sound, event.gain, out=scratch[:n])
+        final_wave[start:start + n] += scratch[:n]
+
+    meter = BlockMeter(sample_rate, channels, loudness_weights(layout), loudness=target == "lufs")
+    meter.process(final_wave)
+    final_wave *= normalization_gain(meter, target, level)
+    return final_wave
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render an event timeline to WAV")
+    parser.add_argument("timeline")
+    parser.add_argument("out")
+    parser.add_argument("--target", choices=["peak", "lufs"], default="peak")
+    parser.add_argument("--level", type=float, default=None, help="dBFS for peak, LUFS for lufs")
+    parser.add_argument("--rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--layout", choices=list(LAYOUTS), default="Stereo")
+    args = parser.parse_args()
+    wave = render_timeline(Timeline.load(args.timeline), args.target, args.level, args.rate, args.layout)
+    write_wav(args.out, wave, args.rate)
+    print(f"Rendered: {args.out}")
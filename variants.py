@@ -0,0 +1,128 @@
+import os
+import argparse
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
+
+from synth import SAMPLE_RATE
+from features import stft_window
+from preset_manager import PresetManager
+from render_cache import RenderCache
+from resample import rate_fraction, resample
+from export import write_wav
+
+PV_FFT_SIZE = 2048
+PV_HOP = 512  # must divide PV_FFT_SIZE
+
+@lru_cache(maxsize=8)
+def phase_advance(n_fft: int, hop: int) -> np.ndarray:
+    """Expected phase advance of each rfft bin over one hop."""
+    advance = 2 * np.pi * hop * np.arange(n_fft // 2 + 1) / n_fft
+    advance.setflags(write=False)
+    return advance
+
+@lru_cache(maxsize=8)
+def _window_squares(n_fft: int, hop: int) -> np.ndarray:
+    # Squared synthesis window split into its hop-sized segments
+    squares = (stft_window(n_fft) ** 2).reshape(n_fft // hop, hop)
+    squares.setflags(write=False)
+    return squares
+
+def _as_frames(wave: np.ndarray):
+    return (wave[:, None], True) if wave.ndim == 1 else (wave, False)
+
+def stft(wave: np.ndarray, n_fft: int = PV_FFT_SIZE, hop: int = PV_HOP) -> np.ndarray:
+    """(frames, channels, bins) spectra of an (n, channels) signal, centred frames, one batched FFT."""
+    padded = np.pad(wave, ((n_fft // 2, n_fft // 2 + n_fft), (0, 0)))
+    frames = sliding_window_view(padded, n_fft, axis=0)[::hop] * stft_window(n_fft)
+    return np.fft.rfft(frames, axis=-1)
+
+def istft(spectrum: np.ndarray, length: int, n_fft: int = PV_FFT_SIZE, hop: int = PV_HOP) -> np.ndarray:
+    """
+    Inverse of stft by weighted overlap-add. The frames are added in
+    n_fft // hop strided passes, one per window segment, instead of a loop
+    over frames.
+    """
+    frames = np.fft.irfft(spectrum, n=n_fft, axis=-1) * stft_window(n_fft)
+    count, channels = frames.shape[:2]
+    overlap = n_fft // hop
+    segments = frames.reshape(count, channels, overlap, hop).transpose(2, 0, 3, 1)
+    out = np.zeros(((count + overlap - 1) * hop, channels))
+    envelope = np.zeros(len(out))
+    for k, squares in enumerate(_window_squares(n_fft, hop)):
+        out[k * hop:(k + count) * hop] += segments[k].reshape(count * hop, channels)
+        envelope[k * hop:(k + count) * hop] += np.tile(squares, count)
+    out /= np.maximum(envelope, 1e-3 * envelope.max())[:, None]
+    out = out[n_fft // 2:n_fft // 2 + length]
+    return np.pad(out, ((0, length - len(out)), (0, 0)))
+
+# ------------------- Variants -------------------
+def time_stretch(wave: np.ndarray, stretch: float, n_fft: int = PV_FFT_SIZE, hop: int = PV_HOP) -> np.ndarray:
+    """
+    Phase vocoder: ``stretch`` times longer (2.0 = half speed) at the same
+    pitch. Magnitudes are interpolated between analysis frames and each bin's
+    phase accumulates its measured advance, all frames at once.
+    """
+    if stretch == 1:
+        return np.array(wave, dtype=float)
+    wave, mono = _as_frames(wave)
+    spectrum = stft(wave, n_fft, hop)
+    spectrum = np.concatenate([spectrum, np.zeros_like(spectrum[:1])])
+    steps = np.arange(0, len(spectrum) - 1, 1 / stretch)
+    idx = steps.astype(int)
+    alpha = (steps - idx)[:, None, None]
+
+    left, right = spectrum[idx], spectrum[idx + 1]
+    magnitude = (1 - alpha) * np.abs(left) + alpha * np.abs(right)
+    advance = phase_advance(n_fft, hop)
+    deviation = np.angle(right) - np.angle(left) - advance
+    deviation -= 2 * np.pi * np.round(deviation / (2 * np.pi))
+    phase = np.empty_like(magnitude)
+    phase[0] = np.angle(spectrum[0])
+    np.cumsum(advance + deviation[:-1], axis=0, out=phase[1:])
+    phase[1:] += phase[0]
+
+    out = istft(magnitude * np.exp(1j * phase), int(round(len(wave) * stretch)), n_fft, hop)
+    return out[:, 0] if mono else out
+
+def pitch_shift(wave: np.ndarray, semitones: float, preserve_duration: bool = False) -> np.ndarray:
+    """
+    Pitch by polyphase resampling. Plain resampling is varispeed (higher is
+    also shorter); with ``preserve_duration`` the sound is first time-stretched
+    by the same ratio so it keeps its length.
+    """
+    ratio = 2 ** (semitones / 12)
+    up, down = rate_fraction(1 / ratio)
+    if up == down:
+        return np.array(wave, dtype=float)
+    if not preserve_duration:
+        return resample(wave, up, down)
+    shifted = resample(time_stretch(wave, ratio), up, down)[:len(wave)]
+    return np.pad(shifted, [(0, len(wave) - len(shifted))] + [(0, 0)] * (wave.ndim - 1))
+
+def make_variants(wave: np.ndarray, pitches=(0,), stretches=(1.0,), preserve_duration: bool = False) -> dict:
+    """{(semitones, stretch): buffer} for every combination, all derived from one render."""
+    variants = {}
+    for stretch in stretches:
+        stretched = time_stretch(wave, stretch)
+        for semitones in pitches:
+            variants[(semitones, stretch)] = pitch_shift(stretched, semitones, preserve_duration)
+    return variants
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write pitch/speed variants of a preset")
+    parser.add_argument("preset")
+    parser.add_argument("out_base", help="files are named <out_base>_p<semitones>_s<stretch>.wav")
+    parser.add_argument("--pitch", type=float, nargs="+", default=[0.0], help="semitones")
+    parser.add_argument("--stretch", type=float, nargs="+", default=[1.0], help="length factor")
+    parser.add_argument("--preserve-duration", action="store_true", help="pitch without changing length")
+    parser.add_argument("--rate", type=int, default=SAMPLE_RATE)
+    args = parser.parse_args()
+    layers = PresetManager.load_preset(args.preset)
+    wave = RenderCache().final_wave(layers, buses=PresetManager.load_buses(args.preset), sample_rate=args.rate,
+                                    dynamics=PresetManager.load_dynamics(args.preset))
+    os.makedirs(os.path.dirname(args.out_base) or ".", exist_ok=True)
+    for (semitones, stretch), variant in make_variants(wave, args.pitch, args.stretch, args.preserve_duration).items():
+        path = f"{args.out_base}_p{semitones:g}_s{stretch:g}.wav"
+        write_wav(path, variant, args.rate)
+        print(f"Written: {path}")